@@ -2,52 +2,36 @@ import streamlit as st
 import pandas as pd
 import requests
 import os
+import hashlib
 from pathlib import Path
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 from datetime import datetime, timedelta
+import time
+import json
+import csv
+import io
+import re
+import threading
+import multiprocessing
+import pickle
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 import warnings
 import subprocess
 import sys
-warnings.filterwarnings('ignore')
 
-# Try to import spaCy, but make it optional
-try:
-    import spacy
-    SPACY_INSTALLED = True
-except ImportError:
-    SPACY_INSTALLED = False
+# CPU-heavy stages (spaCy, TextBlob, ARIMA) live in an importable module so
+# they can run in worker processes; its optional imports set these flags
+from compute_jobs import HAS_STATSMODELS, enrich_texts, forecast_sales, warm_up
 
-# Try to import TextBlob
-try:
-    from textblob import TextBlob
-    TEXTBLOB_INSTALLED = True
-except ImportError:
-    TEXTBLOB_INSTALLED = False
-
-# ----------------------------------------------------------
-# Load spaCy model with graceful fallback
-# ----------------------------------------------------------
-NLP_AVAILABLE = False
-nlp = None
-
-if SPACY_INSTALLED:
-    try:
-        nlp = spacy.load("en_core_web_sm")
-        NLP_AVAILABLE = True
-    except OSError:
-        # Model not downloaded yet, will use keyword fallback
-        NLP_AVAILABLE = False
-
-
-# Try to import statsmodels, but make it optional
-try:
-    from statsmodels.tsa.arima.model import ARIMA
-    HAS_STATSMODELS = True
-except ImportError:
-    HAS_STATSMODELS = False
-    ARIMA = None
+# Silence library warnings, except the C parser's bad-line reports, which
+# ingest_csv turns into quarantine files. Added once per process: re-adding
+# on every rerun would briefly put 'ignore' back in front of the parser rule.
+for action, category in (('ignore', Warning), ('always', pd.errors.ParserWarning)):
+    if (action, None, category, None, 0) not in warnings.filters:
+        warnings.filterwarnings(action, category=category)
 
 # ----------------------------------------------------------
 # Load API Configuration
@@ -75,20 +59,19 @@ REVIEWS_SHEET_ID = os.getenv("GOOGLE_REVIEWS_SHEET_ID", "")
 POS_SHEET_ID = os.getenv("GOOGLE_POS_SHEET_ID", "")
 INVENTORY_SHEET_ID = os.getenv("GOOGLE_INVENTORY_SHEET_ID", "")
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
 def load_from_google_sheets(sheet_id, sheet_name):
-    """Load data from public Google Sheet"""
+    """
+    Load data from public Google Sheet (polled by the background DataRefresher).
+    
+    Download errors are raised, not swallowed: an empty frame would look like
+    a new, empty version of the data.
+    """
     if not sheet_id or not GOOGLE_SHEETS_ENABLED:
         return pd.DataFrame()
     
-    try:
-        # Access public Google Sheet
-        url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/query?tqx=out:csv&sheet={sheet_name}"
-        df = pd.read_csv(url)
-        return df
-    except Exception as e:
-        st.warning(f"⚠️ Could not load from Google Sheets: {str(e)}")
-        return pd.DataFrame()
+    # Access public Google Sheet
+    url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/query?tqx=out:csv&sheet={sheet_name}"
+    return pd.read_csv(url)
 
 # ----------------------------------------------------------
 # Configure Streamlit
@@ -154,37 +137,6 @@ EXPLANATIONS = {
 }
 
 
-# ----------------------------------------------------------
-# Utility: Extract dishes (works with or without spaCy)
-# ----------------------------------------------------------
-DISH_KEYWORDS = [
-    "pizza","burger","pasta","salad","soup","steak","fries","tacos","biryani",
-    "sandwich","wrap","momos","noodles","ramen","curry","pancakes","omelette"
-]
-
-def extract_dish(text):
-    """Extract dish name from text using spaCy if available, otherwise keyword matching"""
-    text_lower = text.lower()
-    
-    # First try spaCy if available
-    if NLP_AVAILABLE and nlp is not None:
-        try:
-            doc = nlp(text_lower)
-            for np in doc.noun_chunks:
-                for dish in DISH_KEYWORDS:
-                    if dish in np.text:
-                        return dish
-        except:
-            pass
-    
-    # Fallback to simple keyword matching
-    for dish in DISH_KEYWORDS:
-        if dish in text_lower:
-            return dish
-    
-    return "Unknown"
-
-
 # ----------------------------------------------------------
 # Utility: LLM Summary Generator (OpenRouter)
 # ----------------------------------------------------------
@@ -270,75 +222,155 @@ def generate_llm_summary(text):
         return f"⚠️ Summary generation failed: {str(e)[:100]}"
 
 
-# ----------------------------------------------------------
-# Utility: Sales Forecasting with ARIMA
-# ----------------------------------------------------------
-def forecast_sales(sales_data, periods=7):
-    """Forecast sales using ARIMA model (optional feature)"""
-    if not HAS_STATSMODELS:
-        return None
-    
-    try:
-        if len(sales_data) < 4:
-            return None
-        
-        # Ensure we have a proper array/series
-        if isinstance(sales_data, np.ndarray):
-            sales_array = sales_data
-        else:
-            sales_array = np.array(sales_data)
-        
-        model = ARIMA(sales_array, order=(1, 1, 1))
-        fitted_model = model.fit()
-        forecast = fitted_model.get_forecast(steps=periods)
-        
-        # Handle the forecast result - it may be Series or array
-        forecast_values = forecast.predicted_mean
-        if hasattr(forecast_values, 'values'):
-            return forecast_values.values
-        else:
-            return np.array(forecast_values)
-    except Exception as e:
-        return None
-
 # ----------------------------------------------------------
 # Utility: Generate Dish Performance Ranking
 # ----------------------------------------------------------
-def get_dish_performance(df, pos_df):
-    """Rank dishes by sentiment, sales, and popularity"""
+def get_dish_partials(df, pos_df):
+    """Additive per-dish sums; partials from several locations can simply be added"""
     if df.empty or 'dish' not in df.columns:
         return pd.DataFrame()
     
-    # Sentiment metrics
-    sentiment_by_dish = df.groupby('dish').agg({
-        'sentiment': ['mean', 'count'],
-        'sentiment_label': lambda x: (x == 'Positive').sum()
-    }).round(3)
-    sentiment_by_dish.columns = ['avg_sentiment', 'review_count', 'positive_count']
+    # Sentiment sums
+    partials = df.groupby('dish', observed=True).agg(
+        sentiment_sum=('sentiment', 'sum'),
+        review_count=('sentiment', 'count'),
+        positive_count=('sentiment_label', lambda x: (x == 'Positive').sum())
+    )
     
-    # Sales metrics
+    # Sales sums
     if not pos_df.empty and 'item' in pos_df.columns and 'qty' in pos_df.columns:
-        sales_by_dish = pos_df.groupby('item').agg({
-            'qty': 'sum',
-            'price': 'mean'
-        }).round(2)
-        sales_by_dish.columns = ['total_qty', 'avg_price']
-        
-        # Merge
-        performance = sentiment_by_dish.join(sales_by_dish, how='outer').fillna(0)
+        sales = pos_df.groupby('item', observed=True).agg(qty_sum=('qty', 'sum'))
+        if 'price' in pos_df.columns:
+            prices = pos_df.groupby('item', observed=True)['price'].agg(['sum', 'count'])
+            sales['price_sum'] = prices['sum']
+            sales['price_count'] = prices['count']
+        else:
+            sales['price_sum'] = 0
+            sales['price_count'] = 0
+        partials = partials.join(sales, how='outer')
     else:
-        performance = sentiment_by_dish.copy()
-        performance['total_qty'] = 0
-        performance['avg_price'] = 0
+        partials['qty_sum'] = 0
+        partials['price_sum'] = 0
+        partials['price_count'] = 0
+    
+    partials = partials.fillna(0)
+    partials.index = partials.index.astype(str)
+    partials.index.name = 'dish'
+    return partials
+
+def get_performance_from_partials(partials):
+    """Turn (possibly combined) per-dish partials into the scored ranking"""
+    if partials.empty:
+        return pd.DataFrame()
+    
+    performance = pd.DataFrame(index=partials.index)
+    performance['avg_sentiment'] = (partials['sentiment_sum'] / partials['review_count']).fillna(0).round(3)
+    performance['review_count'] = partials['review_count']
+    performance['positive_count'] = partials['positive_count']
+    performance['total_qty'] = partials['qty_sum'].round(2)
+    performance['avg_price'] = (partials['price_sum'] / partials['price_count']).fillna(0).round(2)
     
     # Calculate performance score
-    performance['sentiment_score'] = (performance['avg_sentiment'] + 1) / 2 * 100  # 0-100
-    performance['popularity_score'] = (performance['review_count'] / performance['review_count'].max() * 100).fillna(0)
-    performance['sales_score'] = (performance['total_qty'] / performance['total_qty'].max() * 100).fillna(0)
-    performance['overall_score'] = (performance['sentiment_score'] * 0.4 + performance['popularity_score'] * 0.3 + performance['sales_score'] * 0.3).round(1)
+    metrics = normalize_metrics(get_metric_matrix(performance), performance['avg_price'].to_numpy(np.float64), "max")
+    performance['sentiment_score'] = metrics[:, 0]  # 0-100
+    performance['popularity_score'] = metrics[:, 1]
+    performance['sales_score'] = metrics[:, 2]
+    performance['overall_score'] = (metrics @ np.asarray(DEFAULT_SCORE_WEIGHTS)).round(1)
     
     return performance.sort_values('overall_score', ascending=False)
 
+def get_dish_performance(df, pos_df):
+    """Rank dishes by sentiment, sales, and popularity"""
+    return get_performance_from_partials(get_dish_partials(df, pos_df))
+
+# ----------------------------------------------------------
+# Utility: Scoring Engine (weight scenarios)
+# ----------------------------------------------------------
+SCORE_METRICS = ["sentiment", "popularity", "sales"]
+DEFAULT_SCORE_WEIGHTS = (0.4, 0.3, 0.3)
+NORMALIZATIONS = {
+    "max": "Share of the best dish (0-100)",
+    "rank": "Percentile rank among dishes (0-100)",
+    "zscore": "Standard deviations from the average dish",
+    "revenue": "Like max, but sales counted as revenue (qty × avg price)",
+}
+
+def get_metric_matrix(performance):
+    """Raw (dishes x metrics) matrix: avg sentiment, review count, quantity sold"""
+    return performance[['avg_sentiment', 'review_count', 'total_qty']].to_numpy(np.float64)
+
+def max_scale(values):
+    """Scale each column to 0-100 of its maximum (0 where the maximum is 0)"""
+    peak = values.max(axis=0) if len(values) else np.zeros(values.shape[1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scaled = values / peak * 100
+    return np.nan_to_num(scaled, nan=0.0, posinf=0.0, neginf=0.0)
+
+def normalize_metrics(raw, avg_price, method="max"):
+    """Put the raw metric columns on a common scale"""
+    if method == "max":
+        return np.column_stack([(raw[:, 0] + 1) / 2 * 100, max_scale(raw[:, 1:])])
+    if method == "revenue":
+        revenue = raw[:, 2] * avg_price
+        return np.column_stack([(raw[:, 0] + 1) / 2 * 100, max_scale(np.column_stack([raw[:, 1], revenue]))])
+    if method == "rank":
+        return pd.DataFrame(raw).rank(pct=True).to_numpy() * 100
+    if method == "zscore":
+        spread = raw.std(axis=0)
+        spread[spread == 0] = 1.0
+        return (raw - raw.mean(axis=0)) / spread
+    raise ValueError(f"Unknown normalization: {method}")
+
+def weight_grid(step=0.1):
+    """Every weight vector on the simplex with the given step (all weights sum to 1)"""
+    ticks = int(round(1 / step))
+    a, b = np.meshgrid(np.arange(ticks + 1), np.arange(ticks + 1), indexing='ij')
+    a, b = a.ravel(), b.ravel()
+    keep = a + b <= ticks
+    return np.column_stack([a[keep], b[keep], ticks - a[keep] - b[keep]]) / ticks
+
+def evaluate_scenarios(performance, weights, normalizations=("max",)):
+    """
+    Score every dish under every (normalization, weight vector) scenario.
+    
+    weights is a (scenarios x metrics) matrix; each row is rescaled to sum
+    to 1 and is evaluated under every normalization. The scores for all
+    scenarios come from a single einsum over the stacked metric matrices.
+    Returns (scores, ranks, scenarios): dish x scenario frames plus a
+    scenario table.
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+    totals = weights.sum(axis=1, keepdims=True)
+    totals[totals == 0] = 1.0
+    weights = weights / totals
+    if performance.empty or len(weights) == 0 or len(normalizations) == 0:
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    
+    raw = get_metric_matrix(performance)
+    avg_price = performance['avg_price'].to_numpy(np.float64)
+    stacked = np.stack([normalize_metrics(raw, avg_price, method) for method in normalizations])  # (norms, dishes, metrics)
+    scores = np.einsum('ndm,sm->dns', stacked, weights).reshape(len(raw), -1)  # (dishes, norms * weights)
+    
+    scenarios = pd.DataFrame(np.tile(weights, (len(normalizations), 1)).round(3), columns=SCORE_METRICS)
+    scenarios.insert(0, 'normalization', np.repeat(list(normalizations), len(weights)))
+    scenarios.index.name = 'scenario'
+    scores = pd.DataFrame(scores, index=performance.index, columns=scenarios.index)
+    ranks = scores.rank(method='min', ascending=False).astype(np.int32)  # Ties share a rank
+    return scores, ranks, scenarios
+
+def summarize_scenario_ranks(ranks, top_n=5):
+    """How robust each dish's position is across all scenarios"""
+    if ranks.empty:
+        return pd.DataFrame()
+    values = ranks.to_numpy()
+    summary = pd.DataFrame({
+        'best_rank': values.min(axis=1),
+        'median_rank': np.median(values, axis=1),
+        'worst_rank': values.max(axis=1),
+        'top_share': ((values <= top_n).mean(axis=1) * 100).round(1),
+    }, index=ranks.index)
+    return summary.sort_values(['median_rank', 'best_rank'])
+
 # ----------------------------------------------------------
 # Utility: Inventory Alerts
 # ----------------------------------------------------------
@@ -351,7 +383,7 @@ def generate_inventory_alerts(inv_df, pos_df):
     
     # Calculate average daily sales
     if not pos_df.empty and 'item' in pos_df.columns and 'qty' in pos_df.columns:
-        daily_sales = pos_df.groupby('item')['qty'].sum()
+        daily_sales = pos_df.groupby('item', observed=True)['qty'].sum()
     else:
         daily_sales = pd.Series()
     
@@ -390,149 +422,1592 @@ def generate_inventory_alerts(inv_df, pos_df):
     return alerts
 
 # ----------------------------------------------------------
-# Main Dashboard UI
+# Utility: Reorder Points & Safety Stock
 # ----------------------------------------------------------
-st.title("🍽️ Restaurant AI Dashboard")
-st.markdown("*Real-time insights powered by AI — Local Compute + OpenRouter LLM*")
+# z-scores for the chance of not running out during the lead time
+SERVICE_LEVEL_Z = {"90%": 1.2816, "95%": 1.6449, "98%": 2.0537, "99%": 2.3263}
+WHAT_IF_LEAD_TIMES = [1, 3, 7, 14, 21]
+
+def get_demand_stats(pos_df, alpha=0.3):
+    """Per-item daily demand forecast (EWMA) and daily standard deviation from POS"""
+    empty = pd.DataFrame(columns=['forecast_daily', 'std_daily'], dtype='float64')
+    if pos_df.empty or not {'item', 'qty', 'date'} <= set(pos_df.columns):
+        return empty
+    
+    dates = pd.to_datetime(pos_df['date'], errors='coerce')
+    valid = dates.notna()
+    if not valid.any():
+        return empty
+    
+    # Item x day matrix with zero-sales days filled in
+    daily = (pos_df.loc[valid, 'qty']
+             .groupby([pos_df.loc[valid, 'item'].astype(str), dates[valid].dt.normalize()])
+             .sum()
+             .unstack(fill_value=0))
+    full_range = pd.date_range(daily.columns.min(), daily.columns.max(), freq='D')
+    daily = daily.reindex(columns=full_range, fill_value=0).astype('float64')
+    
+    values = daily.to_numpy()
+    forecast = daily.T.ewm(alpha=alpha, adjust=False).mean().iloc[-1].to_numpy()
+    std = values.std(axis=1, ddof=1) if values.shape[1] > 1 else np.zeros(len(daily))
+    return pd.DataFrame({'forecast_daily': forecast, 'std_daily': std}, index=daily.index)
+
+def compute_replenishment(on_hand, demand, sigma, lead_times, z, review_days):
+    """
+    Reorder maths for every SKU and lead time at once.
+    
+    Inputs are per-SKU arrays; lead_times is a 1-D array of scenarios.
+    Every result is a (SKU x scenario) matrix, so there is no per-row Python.
+    """
+    on_hand = on_hand[:, None]
+    demand = demand[:, None]
+    lead = np.asarray(lead_times, dtype='float64')[None, :]
+    
+    safety_stock = z * sigma[:, None] * np.sqrt(lead)
+    reorder_point = demand * lead + safety_stock
+    order_up_to = demand * (lead + review_days) + safety_stock
+    suggested = np.where(on_hand <= reorder_point, np.ceil(np.maximum(order_up_to - on_hand, 0)), 0)
+    return {
+        'safety_stock': safety_stock,
+        'reorder_point': reorder_point,
+        'suggested_qty': suggested,
+    }
+
+def get_replenishment_inputs(inv_df, demand_stats):
+    """Align inventory with demand stats as plain arrays"""
+    stats = demand_stats.reindex(inv_df['item'].astype(str))
+    on_hand = pd.to_numeric(inv_df['qty_on_hand'], errors='coerce').fillna(0).to_numpy('float64')
+    demand = stats['forecast_daily'].fillna(0).to_numpy('float64')
+    sigma = stats['std_daily'].fillna(0).to_numpy('float64')
+    if 'unit_cost' in inv_df.columns:
+        unit_cost = pd.to_numeric(inv_df['unit_cost'], errors='coerce').fillna(0).to_numpy('float64')
+    else:
+        unit_cost = np.zeros(len(inv_df))
+    return on_hand, demand, sigma, unit_cost
+
+def plan_replenishment(inv_df, demand_stats, lead_time_days=3, service_level="95%", review_days=7):
+    """Reorder point, safety stock and suggested order quantity for every SKU"""
+    if inv_df.empty or 'item' not in inv_df.columns or 'qty_on_hand' not in inv_df.columns:
+        return pd.DataFrame()
+    
+    on_hand, demand, sigma, unit_cost = get_replenishment_inputs(inv_df, demand_stats)
+    result = compute_replenishment(on_hand, demand, sigma, [lead_time_days],
+                                   SERVICE_LEVEL_Z[service_level], review_days)
+    suggested = result['suggested_qty'][:, 0]
+    
+    plan = pd.DataFrame({
+        'item': inv_df['item'].astype(str).to_numpy(),
+        'qty_on_hand': on_hand,
+        'daily_demand': demand.round(2),
+        'safety_stock': result['safety_stock'][:, 0].round(1),
+        'reorder_point': result['reorder_point'][:, 0].round(1),
+        'suggested_qty': suggested,
+        'order_value': (suggested * unit_cost).round(2),
+        'days_of_cover': np.divide(on_hand, demand, out=np.full_like(on_hand, np.inf), where=demand > 0).round(1),
+    })
+    if 'sku' in inv_df.columns:
+        plan.insert(0, 'sku', inv_df['sku'].astype(str).to_numpy())
+    return plan
+
+def what_if_lead_times(inv_df, demand_stats, lead_times=WHAT_IF_LEAD_TIMES, service_level="95%", review_days=7):
+    """Reorder workload and spend for each candidate lead time, evaluated in one pass"""
+    if inv_df.empty or 'item' not in inv_df.columns or 'qty_on_hand' not in inv_df.columns:
+        return pd.DataFrame()
+    
+    on_hand, demand, sigma, unit_cost = get_replenishment_inputs(inv_df, demand_stats)
+    result = compute_replenishment(on_hand, demand, sigma, lead_times,
+                                   SERVICE_LEVEL_Z[service_level], review_days)
+    suggested = result['suggested_qty']
+    return pd.DataFrame({
+        'lead_time_days': lead_times,
+        'skus_to_reorder': (suggested > 0).sum(axis=0),
+        'order_units': suggested.sum(axis=0),
+        'order_value': (suggested * unit_cost[:, None]).sum(axis=0).round(2),
+        'safety_stock_units': result['safety_stock'].sum(axis=0).round(1),
+    })
 
 # ----------------------------------------------------------
-# Load data from Google Sheets OR CSV files
+# Utility: Trends & Anomalies (rolling windows, incremental)
 # ----------------------------------------------------------
-st.sidebar.markdown("## 📊 Data Source")
-data_source = st.sidebar.radio(
-    "Choose data source:",
-    ["📁 Local CSV Files", "📊 Google Sheets"],
-    help="Switch between local files and live Google Sheets data"
-)
+TREND_WINDOW_DAYS = 7     # Baseline = the previous week
+TREND_MIN_PERIODS = 3     # Days of history needed before a day can be flagged
+ANOMALY_Z = 2.5           # |z| at or above this is flagged
+TREND_METRICS = {
+    # metric: (frame, key column, value column, daily aggregation, minimum spread)
+    "sentiment": ("reviews", "dish", "sentiment", "mean", 0.05),
+    "sales": ("pos", "item", "qty", "sum", 1.0),
+}
 
-DATA_DIR = Path(__file__).parent / "data"
+def get_daily_matrix(frame, dates, key, value, how):
+    """Day x key matrix of a value, one row per calendar day"""
+    matrix = frame[value].groupby([dates, frame[key].astype(str)]).agg(how).unstack()
+    matrix = matrix.reindex(pd.date_range(matrix.index.min(), matrix.index.max(), freq='D'))
+    if how == 'sum':
+        matrix = matrix.fillna(0)
+    return matrix.astype('float32')
 
-# Initialize data
-df = pd.DataFrame()
-df_pos = pd.DataFrame()
-df_inv = pd.DataFrame()
-text_column = None
-
-if data_source == "📊 Google Sheets":
-    if REVIEWS_SHEET_ID and GOOGLE_SHEETS_ENABLED:
-        st.sidebar.info("✅ Loading from Google Sheets")
-        df = load_from_google_sheets(REVIEWS_SHEET_ID, "restaurant_reviews")
-        df_pos = load_from_google_sheets(POS_SHEET_ID, "pos_sales")
-        df_inv = load_from_google_sheets(INVENTORY_SHEET_ID, "inventory")
-        
-        if df.empty and df_pos.empty and df_inv.empty:
-            st.warning("""
-            ❌ Google Sheets not configured. 
-            
-            To enable Google Sheets integration:
-            1. Create sheets at https://sheets.google.com
-            2. Get your Sheet IDs
-            3. Add to Streamlit Cloud Secrets:
-               - GOOGLE_REVIEWS_SHEET_ID=your_id
-               - GOOGLE_POS_SHEET_ID=your_id
-               - GOOGLE_INVENTORY_SHEET_ID=your_id
-            """)
+def get_rolling_scores(matrix, history, how, min_spread):
+    """Rolling baseline and z-score of each new day against the days before it"""
+    warmup = 0 if history is None else len(history)
+    combined = matrix if history is None else pd.concat([history, matrix])
+    if how == 'sum':
+        combined = combined.fillna(0)  # Items first sold today had zero sales before
+    window = combined.rolling(TREND_WINDOW_DAYS, min_periods=TREND_MIN_PERIODS)
+    baseline = window.mean().shift(1)
+    spread = window.std().shift(1).clip(lower=min_spread)
+    zscores = (combined - baseline) / spread
+    return baseline.iloc[warmup:].astype('float32'), zscores.iloc[warmup:].astype('float32')
+
+def find_anomalies(metric, values, baseline, zscores):
+    """Flag every (day, dish) whose |z| crosses ANOMALY_Z"""
+    flagged = zscores.stack().astype('float64')
+    flagged = flagged[flagged.abs() >= ANOMALY_Z]
+    if flagged.empty:
+        return pd.DataFrame(columns=['date', 'metric', 'name', 'value', 'baseline', 'z', 'direction'])
+    index = flagged.index
+    return pd.DataFrame({
+        'date': index.get_level_values(0),
+        'metric': metric,
+        'name': index.get_level_values(1),
+        'value': values.stack().reindex(index).astype('float64').round(2).to_numpy(),
+        'baseline': baseline.stack().reindex(index).astype('float64').round(2).to_numpy(),
+        'z': flagged.round(2).to_numpy(),
+        'direction': np.where(flagged.to_numpy() < 0, "📉 drop", "📈 spike"),
+    })
+
+def update_metric_trend(previous, frame, key, value, how, min_spread, metric):
+    """
+    Roll one metric's daily series forward.
+    
+    When the rows up to the previous last day are unchanged, only the new
+    days are aggregated and scored, using the last window of history as
+    warm-up; otherwise (first run or backfilled history) everything is
+    recomputed.
+    """
+    if frame.empty or not {key, value, 'date'} <= set(frame.columns):
+        return None
+    dates = pd.to_datetime(frame['date'], errors='coerce').dt.normalize()
+    valid = dates.notna()
+    if not valid.any():
+        return None
+    
+    history = None
+    rows = valid
+    if previous is not None:
+        known = valid & (dates <= previous["last_date"])
+        if known.sum() == previous["rows"]:
+            rows = valid & (dates > previous["last_date"])
+            if not rows.any():
+                return previous
+            history = previous["values"].tail(TREND_WINDOW_DAYS)
+        else:
+            previous = None  # History changed: full recompute
+    
+    matrix = get_daily_matrix(frame[rows], dates[rows], key, value, how)
+    if history is not None:
+        # Keep the calendar continuous between the old and new days
+        matrix = matrix.reindex(pd.date_range(previous["last_date"] + timedelta(days=1), matrix.index.max(), freq='D'))
+        if how == 'sum':
+            matrix = matrix.fillna(0)
+    baseline, zscores = get_rolling_scores(matrix, history, how, min_spread)
+    anomalies = find_anomalies(metric, matrix, baseline, zscores)
+    
+    if previous is not None:
+        matrix = pd.concat([previous["values"], matrix])
+        baseline = pd.concat([previous["baseline"], baseline])
+        zscores = pd.concat([previous["zscores"], zscores])
+        anomalies = pd.concat([previous["anomalies"], anomalies], ignore_index=True)
+        if how == 'sum':
+            matrix = matrix.fillna(0)
+    
+    return {
+        "last_date": matrix.index.max(),
+        "rows": int(valid.sum()),
+        "values": matrix,
+        "baseline": baseline,
+        "zscores": zscores,
+        "anomalies": anomalies,
+    }
+
+def update_trends(previous, df, df_pos):
+    """Per-dish sentiment and per-item sales trends, updated incrementally from the previous version"""
+    frames = {"reviews": df, "pos": df_pos}
+    trends = {}
+    for metric, (frame_name, key, value, how, min_spread) in TREND_METRICS.items():
+        prior = previous.get(metric) if previous else None
+        trends[metric] = update_metric_trend(prior, frames[frame_name], key, value, how, min_spread, metric)
+    return trends
+
+def get_recent_anomalies(trends, days=30):
+    """Anomalies from the last `days` days of each metric, newest first"""
+    recent = []
+    for trend in trends.values():
+        if trend is not None and not trend["anomalies"].empty:
+            cutoff = trend["last_date"] - timedelta(days=days)
+            recent.append(trend["anomalies"][trend["anomalies"]['date'] > cutoff])
+    if not recent:
+        return pd.DataFrame()
+    return pd.concat(recent, ignore_index=True).sort_values(['date', 'z'], ascending=[False, True])
+
+# ----------------------------------------------------------
+# Utility: Duplicate Review Detection (exact hash + MinHash/LSH)
+# ----------------------------------------------------------
+DEDUP_INDEX_DIR = Path(os.getenv("DEDUP_INDEX_DIR", Path(__file__).parent / ".dedup_index"))
+DEDUP_INDEX_FORMAT = 3      # Bump when the hashing below changes; old indexes are then ignored
+SHINGLE_SIZE = 4            # Character n-grams of the normalised text
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16              # 16 bands x 4 rows: pairs above ~50% similarity become candidates
+NEAR_DUPLICATE_SIMILARITY = 0.8
+MIN_NEAR_DUPLICATE_SHINGLES = 20  # Shorter texts ("Great food!") must match exactly
+NO_REVIEW_DATE = np.iinfo(np.int64).min
+MINHASH_CHUNK_SHINGLES = 100_000
+
+# Fixed seed: signatures must stay comparable with the persisted index
+minhash_rng = np.random.default_rng(20240501)
+MINHASH_A = minhash_rng.integers(1, 1 << 32, MINHASH_PERMUTATIONS, dtype=np.uint64).astype(np.uint32) | np.uint32(1)
+MINHASH_B = minhash_rng.integers(0, 1 << 32, MINHASH_PERMUTATIONS, dtype=np.uint64).astype(np.uint32)
+BAND_MIX = minhash_rng.integers(1, 1 << 61, MINHASH_PERMUTATIONS // LSH_BANDS, dtype=np.uint64)
+
+def normalize_review_text(texts):
+    """Lowercase, drop punctuation and collapse whitespace so copies compare equal"""
+    return (texts.astype(str).str.lower()
+            .str.replace(r'[^a-z0-9\s]', ' ', regex=True)
+            .str.split().str.join(' '))
+
+def get_minhash_signatures(texts):
+    """MinHash signature (n x MINHASH_PERMUTATIONS, uint32) of each text's character shingles"""
+    signatures = np.empty((len(texts), MINHASH_PERMUTATIONS), dtype=np.uint32)
+    start = 0
+    while start < len(texts):
+        # Take documents until the chunk holds enough shingles
+        shingles, offsets, end, total = [], [], start, 0
+        while end < len(texts) and (total < MINHASH_CHUNK_SHINGLES or end == start):
+            text = texts[end]
+            grams = [text[i:i + SHINGLE_SIZE] for i in range(max(len(text) - SHINGLE_SIZE + 1, 1))]
+            offsets.append(total)
+            shingles.extend(grams)
+            total += len(grams)
+            end += 1
+        
+        # (a*x + b) mod 2^32 with odd a, then a xorshift-multiply finaliser:
+        # a cheap bijection on 32-bit hashes without the linear bias
+        hashed = pd.util.hash_array(np.array(shingles, dtype=object)).astype(np.uint32)
+        permuted = MINHASH_A[:, None] * hashed[None, :]
+        permuted += MINHASH_B[:, None]
+        permuted ^= permuted >> np.uint32(16)
+        permuted *= np.uint32(0x85EBCA6B)
+        permuted ^= permuted >> np.uint32(13)
+        signatures[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        start = end
+    return signatures
+
+def get_band_hashes(signatures):
+    """One bucket key per LSH band (n x LSH_BANDS)"""
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    bands = signatures.astype(np.uint64).reshape(len(signatures), LSH_BANDS, rows)
+    return (bands * BAND_MIX).sum(axis=2)  # Wrapping uint64 mix; collisions are re-checked
+
+def get_review_days(df):
+    """Calendar day of each review (days since epoch); duplicates must share a day"""
+    if 'date' not in df.columns:
+        return np.zeros(len(df), dtype=np.int64)  # No dates: every review is one bucket
+    days = pd.to_datetime(df['date'], errors='coerce').dt.normalize().to_numpy()
+    missing = np.isnat(days)
+    days = days.astype('datetime64[D]').astype(np.int64)
+    days[missing] = NO_REVIEW_DATE
+    return days
+
+def get_exact_keys(exact, days):
+    """Exact-duplicate key: the normalised text hash on a given day"""
+    return pd.util.hash_pandas_object(pd.DataFrame({'exact': exact, 'day': days}), index=False).to_numpy()
+
+def find_near_duplicates(signatures, first_candidate, days=None):
+    """
+    Mark rows at or after `first_candidate` that are near-copies of an earlier row.
+    
+    Rows sharing any LSH bucket (on the same day, when `days` is given) are
+    compared with that bucket's earliest member only, so the work grows with
+    rows x bands, not rows squared.
+    """
+    is_near = np.zeros(len(signatures), dtype=bool)
+    if len(signatures) < 2 or first_candidate >= len(signatures):
+        return is_near
+    
+    positions = pd.Series(np.arange(len(signatures)))
+    band_hashes = get_band_hashes(signatures)
+    for band in range(LSH_BANDS):
+        keys = band_hashes[:, band] if days is None else [band_hashes[:, band], days]
+        earliest = positions.groupby(keys).transform('first').to_numpy()
+        rows = np.nonzero((earliest != positions.to_numpy()) & (positions.to_numpy() >= first_candidate) & ~is_near)[0]
+        if len(rows):
+            similarity = (signatures[rows] == signatures[earliest[rows]]).mean(axis=1)
+            is_near[rows[similarity >= NEAR_DUPLICATE_SIMILARITY]] = True
+    return is_near
+
+def load_dedup_index(index_path):
+    """Persisted signatures of every review seen so far (empty when missing or unreadable)"""
+    empty = {
+        "row_ids": np.empty(0, dtype=np.uint64),
+        "dropped": np.empty(0, dtype=bool),
+        "exact": np.empty(0, dtype=np.uint64),
+        "day": np.empty(0, dtype=np.int64),
+        "near_checked": np.empty(0, dtype=bool),
+        "signatures": np.empty((0, MINHASH_PERMUTATIONS), dtype=np.uint32),
+    }
+    if index_path is None or not index_path.exists():
+        return empty
+    try:
+        with np.load(index_path) as stored:
+            index = {name: stored[name] for name in empty}
+        if index["signatures"].shape[1] != MINHASH_PERMUTATIONS:
+            return empty
+        return index
+    except (OSError, ValueError, KeyError):
+        return empty
+
+def save_dedup_index(index_path, index):
+    """Write the index atomically so readers never see a partial file"""
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_suffix(".tmp.npz")
+    np.savez_compressed(tmp_path, **index)
+    os.replace(tmp_path, index_path)
+
+def dedup_reviews(df, text_column, index_path=None):
+    """
+    Drop exact and near-duplicate reviews, keeping the first copy.
+    
+    Only reviews dated the same day can be duplicates, so short common
+    reviews from different customers on different days all count; texts
+    under MIN_NEAR_DUPLICATE_SHINGLES shingles are only dropped as exact
+    copies. Rows already in the persisted index keep their earlier
+    decision; only new rows are hashed and checked against the kept
+    history and each other. Returns (deduplicated frame, report).
+    """
+    report = {'rows': len(df), 'kept': len(df), 'exact_duplicates': 0, 'near_duplicates': 0,
+              'previously_flagged': 0, 'new_rows_checked': 0}
+    if df.empty or not text_column or text_column not in df.columns:
+        return df, report
+    
+    normalized = normalize_review_text(df[text_column]).fillna('')
+    exact = pd.util.hash_array(normalized.to_numpy(dtype=object))
+    days = get_review_days(df)
+    near_checked = (normalized.str.len() - SHINGLE_SIZE + 1).to_numpy() >= MIN_NEAR_DUPLICATE_SHINGLES
+    
+    # Row identity: text + date + source + occurrence, stable across reloads
+    identity = pd.DataFrame({'exact': exact})
+    for col in ('date', 'source'):
+        if col in df.columns:
+            identity[col] = df[col].astype(str).fillna('').to_numpy()  # pandas 3 keeps NaN through astype(str)
+    identity['occurrence'] = identity.groupby(list(identity.columns), dropna=False).cumcount()
+    row_ids = pd.util.hash_pandas_object(identity, index=False).to_numpy()
+    
+    index = load_dedup_index(index_path)
+    known_dropped = pd.Series(index["dropped"], index=index["row_ids"])
+    known_dropped = known_dropped[~known_dropped.index.duplicated()]
+    is_known = np.isin(row_ids, index["row_ids"])
+    dropped = np.zeros(len(df), dtype=bool)
+    dropped[is_known] = known_dropped.reindex(row_ids[is_known]).to_numpy(dtype=bool)
+    
+    new = np.nonzero(~is_known)[0]
+    report['new_rows_checked'] = len(new)
+    if len(new):
+        kept_history = ~index["dropped"]
+        
+        # Exact copies, same day, of kept history or of an earlier new row
+        new_exact = exact[new]
+        new_keys = get_exact_keys(new_exact, days[new])
+        history_keys = get_exact_keys(index["exact"][kept_history], index["day"][kept_history])
+        is_exact = np.isin(new_keys, history_keys) | pd.Series(new_keys).duplicated().to_numpy()
+        
+        # Near copies among the rest (long enough texts only), via LSH against
+        # kept history + earlier new rows from the same day
+        signatures = get_minhash_signatures(normalized.to_numpy(dtype=object)[new])
+        history = kept_history & index["near_checked"]
+        candidates = np.nonzero(~is_exact & near_checked[new])[0]
+        combined = np.concatenate([index["signatures"][history], signatures[candidates]])
+        combined_days = np.concatenate([index["day"][history], days[new][candidates]])
+        is_near = np.zeros(len(new), dtype=bool)
+        is_near[candidates] = find_near_duplicates(combined, int(history.sum()), combined_days)[int(history.sum()):]
+        
+        dropped[new] = is_exact | is_near
+        report['exact_duplicates'] = int(is_exact.sum())
+        report['near_duplicates'] = int(is_near.sum())
+        
+        if index_path is not None:
+            try:
+                save_dedup_index(index_path, {
+                    "row_ids": np.concatenate([index["row_ids"], row_ids[new]]),
+                    "dropped": np.concatenate([index["dropped"], dropped[new]]),
+                    "exact": np.concatenate([index["exact"], new_exact]),
+                    "day": np.concatenate([index["day"], days[new]]),
+                    "near_checked": np.concatenate([index["near_checked"], near_checked[new]]),
+                    "signatures": np.concatenate([index["signatures"], signatures]),
+                })
+            except OSError:
+                pass  # Read-only deployments just recheck new rows next time
+    
+    report['previously_flagged'] = int(dropped[is_known].sum())
+    report['kept'] = int((~dropped).sum())
+    return df[~dropped].reset_index(drop=True), report
+
+# ----------------------------------------------------------
+# Utility: Dish Performance Snapshots (daily history)
+# ----------------------------------------------------------
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", Path(__file__).parent / ".snapshots"))
+PARTIAL_COLUMNS = ['sentiment_sum', 'review_count', 'positive_count', 'qty_sum', 'price_sum', 'price_count']
+COMPARE_PERIODS = {"Last week": 7, "Last month": 30}
+
+def empty_snapshot_history():
+    """Snapshot history with no days yet"""
+    history = pd.DataFrame({col: pd.Series(dtype='float64') for col in PARTIAL_COLUMNS})
+    history.insert(0, 'dish', pd.Series(dtype='object'))
+    history.insert(0, 'day', pd.Series(dtype='datetime64[ns]'))
+    history['overall_score'] = pd.Series(dtype='float32')
+    history['rank'] = pd.Series(dtype='int32')
+    return history
+
+def load_snapshot_history(path):
+    """Read the columnar snapshot file: one row per (day, dish)"""
+    if path is None or not path.exists():
+        return empty_snapshot_history()
+    try:
+        with np.load(path, allow_pickle=False) as stored:
+            history = pd.DataFrame({'day': stored['day'].astype('datetime64[ns]'),
+                                    'dish': stored['dishes'][stored['dish_code']]})
+            for col in PARTIAL_COLUMNS:
+                history[col] = stored[col].astype('float64')
+            history['overall_score'] = stored['overall_score']
+            history['rank'] = stored['rank']
+        return history
+    except (OSError, ValueError, KeyError):
+        return empty_snapshot_history()
+
+def save_snapshot_history(path, history):
+    """Write the history as compressed column arrays, dish names dictionary-encoded"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    dishes = pd.Categorical(history['dish'].astype(str))
+    tmp_path = path.with_suffix(".tmp.npz")
+    np.savez_compressed(
+        tmp_path,
+        day=history['day'].to_numpy().astype('datetime64[D]'),
+        dishes=np.asarray(dishes.categories, dtype=str),
+        dish_code=dishes.codes.astype(np.int32),
+        overall_score=history['overall_score'].to_numpy(np.float32),
+        rank=history['rank'].to_numpy(np.int32),
+        **{col: history[col].to_numpy(np.float64) for col in PARTIAL_COLUMNS},
+    )
+    os.replace(tmp_path, path)
+
+def get_daily_partials(df, pos_df, start, end):
+    """Per-day, per-dish additive partials for rows dated in [start, end]"""
+    parts = []
+    if not df.empty and {'date', 'dish', 'sentiment'} <= set(df.columns):
+        dates = pd.to_datetime(df['date'], errors='coerce').dt.normalize()
+        rows = dates.between(start, end)
+        reviews = pd.DataFrame({
+            'day': dates[rows],
+            'dish': df.loc[rows, 'dish'].astype(str),
+            'sentiment_sum': df.loc[rows, 'sentiment'].astype('float64'),
+            'review_count': 1.0,
+            'positive_count': (df.loc[rows, 'sentiment_label'] == 'Positive').astype('float64'),
+        })
+        parts.append(reviews.groupby(['day', 'dish']).sum())
+    if not pos_df.empty and {'date', 'item', 'qty'} <= set(pos_df.columns):
+        dates = pd.to_datetime(pos_df['date'], errors='coerce').dt.normalize()
+        rows = dates.between(start, end)
+        has_price = 'price' in pos_df.columns
+        sales = pd.DataFrame({
+            'day': dates[rows],
+            'dish': pos_df.loc[rows, 'item'].astype(str),
+            'qty_sum': pos_df.loc[rows, 'qty'].astype('float64'),
+            'price_sum': pos_df.loc[rows, 'price'].astype('float64') if has_price else 0.0,
+            'price_count': pos_df.loc[rows, 'price'].notna().astype('float64') if has_price else 0.0,
+        })
+        parts.append(sales.groupby(['day', 'dish']).sum())
+    if not parts:
+        return pd.DataFrame(columns=PARTIAL_COLUMNS)
+    daily = pd.concat(parts, axis=1).fillna(0)
+    return daily.reindex(columns=PARTIAL_COLUMNS, fill_value=0)
+
+def get_snapshot_rows(daily, days, base):
+    """
+    Cumulative partials, score and rank for every dish on every day, as
+    (day x dish) matrices; scoring matches get_performance_from_partials.
+    """
+    dishes = daily.index.get_level_values('dish').unique()
+    if base is not None:
+        dishes = dishes.union(base.index)
+    if len(dishes) == 0:
+        return empty_snapshot_history()
+    
+    cumulative = {}
+    for col in PARTIAL_COLUMNS:
+        matrix = (daily[col].unstack('dish') if len(daily) else pd.DataFrame(index=days))
+        matrix = matrix.reindex(index=days, columns=dishes).fillna(0).cumsum()
+        if base is not None:
+            matrix = matrix + base[col].reindex(dishes).fillna(0).to_numpy()
+        cumulative[col] = matrix
+    
+    reviews = cumulative['review_count']
+    qty = cumulative['qty_sum'].round(2)
+    present = (reviews > 0) | (qty != 0) | (cumulative['price_count'] > 0)
+    avg_sentiment = (cumulative['sentiment_sum'] / reviews).fillna(0).round(3)
+    popularity = reviews.div(reviews.max(axis=1), axis=0).fillna(0) * 100
+    sales = qty.div(qty.max(axis=1), axis=0).fillna(0) * 100
+    sentiment_weight, popularity_weight, sales_weight = DEFAULT_SCORE_WEIGHTS
+    overall = ((avg_sentiment + 1) / 2 * 100 * sentiment_weight + popularity * popularity_weight
+               + sales * sales_weight).round(1).where(present)
+    rank = overall.rank(axis=1, method='min', ascending=False)  # Ties share a rank
+    
+    rows = overall.stack().index  # Only present dishes
+    has_reviews = reviews.sum(axis=1) > 0  # Same rule as get_dish_partials: no reviews, no ranking
+    rows = rows[has_reviews.reindex(rows.get_level_values(0)).to_numpy()]
+    snapshot = pd.DataFrame({
+        'day': rows.get_level_values(0),
+        'dish': rows.get_level_values(1).astype(str),
+    })
+    for col in PARTIAL_COLUMNS:
+        snapshot[col] = cumulative[col].stack().reindex(rows).to_numpy()
+    snapshot['overall_score'] = overall.stack().reindex(rows).to_numpy(np.float32)
+    snapshot['rank'] = rank.stack().reindex(rows).to_numpy().astype(np.int32)
+    return snapshot
+
+def update_snapshots(path, df, pos_df):
+    """
+    Append snapshots for days that closed since the last run.
+    
+    A day is closed once it is over (before today) and at most the newest
+    day in the data; only rows from the new days are aggregated, on top of
+    the last stored cumulative partials.
+    """
+    history = load_snapshot_history(path)
+    data_days = []
+    for frame in (df, pos_df):
+        if not frame.empty and 'date' in frame.columns:
+            data_days.append(pd.to_datetime(frame['date'], errors='coerce').dt.normalize())
+    data_days = pd.concat(data_days).dropna() if data_days else pd.Series(dtype='datetime64[ns]')
+    if data_days.empty:
+        return history
+    
+    end = min(pd.Timestamp.now().normalize() - timedelta(days=1), data_days.max())
+    if history.empty:
+        start, base = data_days.min(), None
     else:
-        st.warning("❌ Google Sheets integration not configured. Using local CSV files instead.")
-        data_source = "📁 Local CSV Files"
+        last_day = history['day'].max()
+        start = last_day + timedelta(days=1)
+        base = history[history['day'] == last_day].set_index('dish')[PARTIAL_COLUMNS]
+    if start > end:
+        return history
+    
+    days = pd.date_range(start, end, freq='D')
+    new_rows = get_snapshot_rows(get_daily_partials(df, pos_df, start, end), days, base)
+    history = new_rows if history.empty else pd.concat([history, new_rows], ignore_index=True)
+    if path is not None:
+        try:
+            save_snapshot_history(path, history)
+        except OSError:
+            pass  # Read-only deployments rebuild the history on the next version
+    return history
+
+def compare_snapshots(history, days_back):
+    """Score and rank changes between the latest snapshot and the one `days_back` days earlier"""
+    if history.empty:
+        return pd.DataFrame(), None, None
+    latest_day = history['day'].max()
+    earlier_days = history.loc[history['day'] <= latest_day - timedelta(days=days_back), 'day']
+    if earlier_days.empty:
+        return pd.DataFrame(), latest_day, None
+    then_day = earlier_days.max()
+    
+    now = history[history['day'] == latest_day].set_index('dish')[['overall_score', 'rank']]
+    then = history[history['day'] == then_day].set_index('dish')[['overall_score', 'rank']]
+    comparison = now.join(then, how='left', lsuffix='_now', rsuffix='_then')
+    comparison[['overall_score_now', 'overall_score_then']] = comparison[['overall_score_now', 'overall_score_then']].astype('float64').round(1)
+    comparison['score_change'] = (comparison['overall_score_now'] - comparison['overall_score_then']).round(1)
+    comparison['rank_change'] = comparison['rank_then'] - comparison['rank_now']  # Positive = moved up
+    return comparison.sort_values('rank_now'), latest_day, then_day
+
+# ----------------------------------------------------------
+# Utility: Compact in-memory schema
+# ----------------------------------------------------------
+# Low-cardinality text becomes categorical, dates become datetime64 and
+# numbers are downcast, so several sessions fit in one container.
+COMPACT_SCHEMA = {
+    "reviews": {
+        "dish": "category",
+        "sentiment_label": "category",
+        "source": "category",
+        "mapped_item": "category",
+        "date": "datetime64[ns]",
+        "sentiment": "float32",
+        "rating": "float32",
+        "map_score": "float32",
+    },
+    "pos": {
+        "item": "category",
+        "date": "datetime64[ns]",
+        "qty": "int32",
+        "price": "float32",
+    },
+    "inventory": {
+        "item": "category",
+        "qty_on_hand": "int32",
+        "unit_cost": "float32",
+    },
+}
+
+def apply_compact_schema(frame, kind):
+    """Cast known columns of a reviews/pos/inventory frame to compact dtypes"""
+    if frame.empty:
+        return frame
+
+    frame = frame.copy()
+    for col, dtype in COMPACT_SCHEMA.get(kind, {}).items():
+        if col not in frame.columns or str(frame[col].dtype) == dtype:
+            continue
+        try:
+            if dtype == "category":
+                frame[col] = frame[col].astype("category")
+            elif dtype.startswith("datetime64"):
+                frame[col] = pd.to_datetime(frame[col], errors='coerce')
+            else:
+                values = pd.to_numeric(frame[col], errors='coerce')
+                # Only whole, gap-free values that fit become int32; weights,
+                # volumes and gaps stay float32 instead of being truncated
+                if dtype.startswith("int"):
+                    limits = np.iinfo(dtype)
+                    integral = (values.notna().all() and values.mod(1).eq(0).all()
+                                and values.between(limits.min, limits.max).all())
+                    if not integral:
+                        dtype = "float32"
+                frame[col] = values.astype(dtype)
+        except (TypeError, ValueError):
+            # Leave the column untouched rather than losing data
+            pass
+    return frame
+
+def memory_report(frames):
+    """Summarise rows and deep memory usage for each named frame"""
+    rows = []
+    for name, frame in frames.items():
+        rows.append({
+            'frame': name,
+            'rows': len(frame),
+            'columns': len(frame.columns),
+            'memory_mb': round(frame.memory_usage(deep=True).sum() / 1024 ** 2, 3),
+        })
+    return pd.DataFrame(rows)
+
+# ----------------------------------------------------------
+# Utility: Charts (cached per data version, downsampled)
+# ----------------------------------------------------------
+MAX_SERIES_POINTS = 500    # Line charts are reduced with LTTB above this
+MAX_SCATTER_POINTS = 1000  # Scatter plots keep the most-reviewed dishes
+MAX_BAR_ROWS = 50          # Horizontal bar charts show the most relevant rows
+
+def lttb_downsample(x, y, threshold=MAX_SERIES_POINTS):
+    """
+    Largest-Triangle-Three-Buckets: indices of the points that best keep
+    the shape of a line when it has to be drawn with `threshold` points.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket is the third triangle corner
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(areas.argmax())
+        selected[i + 1] = previous
+    return selected
+
+def downsample_series(series, threshold=MAX_SERIES_POINTS):
+    """Downsample a date-indexed series with LTTB"""
+    if len(series) <= threshold:
+        return series
+    x = pd.DatetimeIndex(series.index).asi8 if isinstance(series.index, pd.DatetimeIndex) else np.arange(len(series))
+    return series.iloc[lttb_downsample(x, series.to_numpy(dtype='float64'), threshold)]
+
+def get_cached_figure(data, name, builder, *args):
+    """Build a figure once per data version; every session then reuses it (read-only)"""
+    figures = data.setdefault("figures", {})
+    if name not in figures:
+        figures[name] = builder(*args)
+    return figures[name]
 
-# Fallback to local CSV files
-if data_source == "📁 Local CSV Files":
-    # Find available CSV files
+def build_sentiment_pie(df):
+    """Pie chart of positive / neutral / negative reviews"""
+    sentiment_counts = df["sentiment_label"].value_counts()
+    fig = px.pie(sentiment_counts, values=sentiment_counts.values, names=sentiment_counts.index, 
+                title="How Customers Feel About Your Restaurant", hole=0.3,
+                color_discrete_map={"Positive": "#4caf50", "Negative": "#f44", "Neutral": "#9e9e9e"})
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    return fig
+
+def build_top_dishes_bar(df):
+    """Bar chart of the 10 most reviewed dishes"""
+    top_dishes = df["dish"].value_counts().head(10)
+    fig = px.bar(x=top_dishes.values, y=top_dishes.index, orientation='h',
+                title="Most Talked About Dishes", labels={"x": "Number of Reviews", "y": "Dish"},
+                color=top_dishes.values, color_continuous_scale='viridis')
+    fig.update_layout(height=400, showlegend=False)
+    return fig
+
+def build_performance_bar(performance):
+    """Bar chart of overall scores, best dishes first"""
+    top = performance.head(MAX_BAR_ROWS)
+    title = "⭐ Dish Performance Scores" if len(performance) <= MAX_BAR_ROWS else f"⭐ Top {MAX_BAR_ROWS} Dish Performance Scores"
+    fig = px.bar(top.reset_index(), x='overall_score', y=top.index, 
+               orientation='h', title=title,
+               labels={"overall_score": "Performance Score (0-100)", "dish": "Dish"},
+               color='overall_score', color_continuous_scale='RdYlGn',
+               text='overall_score')
+    fig.update_traces(textposition='auto')
+    return fig
+
+def build_happiness_scatter(performance):
+    """Scatter of sentiment vs sales, sized by review count"""
+    points = performance
+    if len(points) > MAX_SCATTER_POINTS:
+        points = points.nlargest(MAX_SCATTER_POINTS, 'review_count')
+    fig = px.scatter(points.reset_index(), x='avg_sentiment', y='total_qty', size='review_count',
+                   title="💰 Happiness vs Sales", hover_data=['review_count'],
+                   labels={"avg_sentiment": "Customer Satisfaction", "total_qty": "Items Sold", "review_count": "Reviews"},
+                   color='overall_score', color_continuous_scale='viridis')
+    fig.add_hline(y=0)
+    fig.add_vline(x=0)
+    return fig
+
+def build_stock_bar(df_inv):
+    """Bar chart of stock on hand, lowest first"""
+    lowest = df_inv.nsmallest(MAX_BAR_ROWS, 'qty_on_hand').sort_values('qty_on_hand', ascending=True)
+    title = "📊 Stock Levels (Green = Good, Red = Low)"
+    if len(df_inv) > MAX_BAR_ROWS:
+        title = f"📊 Lowest {MAX_BAR_ROWS} Stock Levels (Green = Good, Red = Low)"
+    fig = px.bar(lowest, 
+                x='qty_on_hand', y='item', orientation='h',
+                title=title,
+                labels={"qty_on_hand": "Quantity in Stock", "item": "Item"},
+                color='qty_on_hand', color_continuous_scale='RdYlGn')
+    return fig
+
+def build_trend_chart(trend, name, label):
+    """Daily values of one dish/item with its rolling baseline and flagged days"""
+    values = trend["values"][name].dropna()
+    baseline = trend["baseline"][name].reindex(values.index)
+    anomalies = trend["anomalies"][trend["anomalies"]['name'] == name]
+    shown = downsample_series(values)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=shown.index, y=shown.values, mode='lines', name=label,
+                           line=dict(color='blue', width=2)))
+    fig.add_trace(go.Scatter(x=shown.index, y=baseline.reindex(shown.index).values, mode='lines',
+                           name=f'{TREND_WINDOW_DAYS}-day average', line=dict(color='gray', dash='dot')))
+    fig.add_trace(go.Scatter(x=anomalies['date'], y=anomalies['value'], mode='markers', name='Unusual day',
+                           marker=dict(color='red', size=10, symbol='x')))
+    fig.update_layout(title=f"{label}: {name}", xaxis_title="Date", height=400, hovermode='x unified')
+    return fig
+
+def build_forecast_chart(daily_sales, forecast_df):
+    """Line chart of past daily sales (downsampled) and the forecast"""
+    history = downsample_series(daily_sales)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=history.index, y=history.values, 
+                           mode='lines', name='Your Past Sales', 
+                           line=dict(color='blue', width=3)))
+    fig.add_trace(go.Scatter(x=forecast_df['date'], y=forecast_df['forecast'],
+                           mode='lines+markers', name='Predicted Sales',
+                           line=dict(color='orange', width=3, dash='dash')))
+    fig.update_layout(title="📊 Sales Forecast (Next 14 Days)", 
+                    xaxis_title="Date", yaxis_title="Items to Sell", 
+                    height=400, hovermode='x unified')
+    return fig
+
+# ----------------------------------------------------------
+# Utility: Compute Pool (CPU-heavy jobs in worker processes)
+# ----------------------------------------------------------
+COMPUTE_WORKERS = int(os.getenv("COMPUTE_WORKERS", str(max((os.cpu_count() or 2) - 1, 1))))
+COMPUTE_QUEUE_LIMIT = int(os.getenv("COMPUTE_QUEUE_LIMIT", str(max(COMPUTE_WORKERS, 1) * 4)))
+ENRICH_CHUNK_ROWS = 500
+
+class ComputePool:
+    """
+    Bounded process pool shared by every session for CPU-bound jobs.
+    
+    At most COMPUTE_QUEUE_LIMIT jobs are queued or running at once; a
+    session submitting more waits for a free slot, so one large build
+    cannot push everyone else's jobs to the back of a long queue. Identical
+    jobs already in flight share one future. With no workers (or a broken
+    pool) jobs run inline on the calling thread.
+    """
+    
+    def __init__(self, workers, queue_limit):
+        self._workers = workers
+        self._queue_limit = max(queue_limit, 1)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self._queue_limit)
+        self._inflight = {}
+        self._executor = self._start() if workers > 0 else None
+    
+    def _start(self):
+        # Spawned workers only import compute_jobs, never the Streamlit script
+        return ProcessPoolExecutor(max_workers=self._workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=warm_up)
+    
+    def submit(self, fn, *args):
+        """Future for fn(*args), reusing an identical job that is still running"""
+        key = (fn.__module__, fn.__name__, hashlib.sha1(pickle.dumps(args, protocol=5)).hexdigest())
+        with self._lock:
+            future = self._inflight.get(key)
+        if future is not None:
+            return future
+        if self._executor is None:
+            return self._run_inline(fn, *args)
+        
+        self._slots.acquire()  # Back-pressure: wait for room in the queue
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._slots.release()
+                return future
+            try:
+                future = self._executor.submit(fn, *args)
+            except (BrokenProcessPool, RuntimeError):
+                self._slots.release()
+                self._executor = self._start()
+                return self._run_inline(fn, *args)
+            self._inflight[key] = future
+        future.add_done_callback(lambda _: self._finish(key))
+        return future
+    
+    def _finish(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+        self._slots.release()
+    
+    @staticmethod
+    def _run_inline(fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
+    def run(self, fn, *args):
+        """fn(*args) via the pool, blocking until the result is ready"""
+        try:
+            return self.submit(fn, *args).result()
+        except BrokenProcessPool:
+            return fn(*args)  # A worker died; finish the job here
+    
+    def map(self, fn, chunks, progress=None):
+        """
+        fn over every chunk, results in order; progress(done, total) as chunks finish.
+        
+        Submitting and draining are interleaved, never more than the queue
+        limit outstanding, so progress is reported while the build runs
+        instead of only after the last chunk has been queued.
+        """
+        results = [None] * len(chunks)
+        positions = {}
+        pending = iter(enumerate(chunks))
+        done = 0
+        while done < len(chunks):
+            for index, chunk in pending:
+                positions.setdefault(self.submit(fn, chunk), []).append(index)
+                if len(positions) >= self._queue_limit:
+                    break
+            finished, _ = wait(positions, return_when=FIRST_COMPLETED)
+            for future in finished:
+                indexes = positions.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    result = fn(chunks[indexes[0]])  # A worker died; finish this chunk here
+                for index in indexes:
+                    results[index] = result
+                done += len(indexes)
+            if progress is not None:
+                progress(done, len(chunks))
+        return results
+
+@st.cache_resource
+def get_compute_pool():
+    """Single ComputePool (and its worker processes) per server process"""
+    return ComputePool(COMPUTE_WORKERS, COMPUTE_QUEUE_LIMIT)
+
+# ----------------------------------------------------------
+# Data Pipeline: load, enrich and aggregate (shared across sessions)
+# ----------------------------------------------------------
+DATA_DIR = Path(__file__).parent / "data"
+LOCATIONS_FILE = Path(os.getenv("LOCATIONS_FILE", Path(__file__).parent / "locations.json"))
+LOCATION_WORKERS = int(os.getenv("LOCATION_WORKERS", str(os.cpu_count() or 4)))
+ALL_LOCATIONS = "🌐 All Locations"
+LOCAL_REFRESH_SECONDS = int(os.getenv("LOCAL_REFRESH_SECONDS", "30"))  # mtime checks are cheap
+SHEETS_REFRESH_SECONDS = int(os.getenv("SHEETS_REFRESH_SECONDS", "300"))  # Each poll downloads the sheets
+
+def load_location_registry():
+    """
+    Map each restaurant location to its own data sources.
+    
+    Uses locations.json when present, e.g.
+    {"Downtown": {"data_dir": "data/downtown", "reviews_sheet_id": "..."}}.
+    Otherwise every sub-folder of data/ with CSVs is a location, and the
+    top-level data/ folder plus the GOOGLE_*_SHEET_ID settings form "Main".
+    """
+    registry = {}
+    if LOCATIONS_FILE.exists():
+        try:
+            with open(LOCATIONS_FILE) as f:
+                for name, config in json.load(f).items():
+                    data_dir = Path(config.get("data_dir", DATA_DIR / name))
+                    if not data_dir.is_absolute():
+                        data_dir = LOCATIONS_FILE.parent / data_dir
+                    registry[name] = {
+                        "data_dir": data_dir,
+                        "reviews_sheet_id": config.get("reviews_sheet_id", ""),
+                        "pos_sheet_id": config.get("pos_sheet_id", ""),
+                        "inventory_sheet_id": config.get("inventory_sheet_id", ""),
+                    }
+        except (OSError, ValueError, AttributeError):
+            registry = {}
+    
+    if not registry:
+        if DATA_DIR.exists():
+            for sub_dir in sorted(p for p in DATA_DIR.iterdir() if p.is_dir()):
+                if any(sub_dir.glob("*.csv")):
+                    registry[sub_dir.name] = {
+                        "data_dir": sub_dir,
+                        "reviews_sheet_id": "",
+                        "pos_sheet_id": "",
+                        "inventory_sheet_id": "",
+                    }
+        if not registry or find_local_files(DATA_DIR) or REVIEWS_SHEET_ID:
+            main = {
+                "data_dir": DATA_DIR,
+                "reviews_sheet_id": REVIEWS_SHEET_ID,
+                "pos_sheet_id": POS_SHEET_ID,
+                "inventory_sheet_id": INVENTORY_SHEET_ID,
+            }
+            registry = {"Main": main, **registry}
+    return registry
+
+def find_local_files(data_dir=DATA_DIR):
+    """Map CSV file stems in the data folder to their paths"""
     available_files = {}
-    if DATA_DIR.exists():
-        for csv_file in DATA_DIR.glob("*.csv"):
+    if data_dir.exists():
+        for csv_file in data_dir.glob("*.csv"):
             available_files[csv_file.stem] = csv_file
+    return available_files
+
+def local_data_version(available_files):
+    """Version key for local CSVs; changes whenever a file is modified"""
+    version = []
+    for name, path in sorted(available_files.items()):
+        try:
+            stat = path.stat()
+            version.append((name, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            continue
+    return tuple(version)
+
+def frames_fingerprint(frames):
+    """Content hash of a set of frames, used to version Google Sheets data"""
+    digest = hashlib.sha1()
+    for frame in frames:
+        digest.update(repr(list(frame.columns)).encode())
+        if not frame.empty:
+            digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    return digest.hexdigest()
+
+QUARANTINE_DIR = Path(os.getenv("QUARANTINE_DIR", Path(__file__).parent / "quarantine"))
+SCHEMA_SAMPLE_ROWS = 1000
+REQUIRED_COLUMNS = {
+    "reviews": [],
+    "pos": ["item", "qty"],
+    "inventory": ["item", "qty_on_hand"],
+}
+BAD_LINE_PATTERN = re.compile(r"Skipping line (\d+): ([^\n]*)")
+
+@st.cache_resource
+def get_parser_warning_router():
+    """
+    Send ParserWarnings to the ingest running on the same thread.
+    
+    warnings.catch_warnings is process-global and would make parallel
+    ingests take turns; this hook is installed once per process and keeps
+    a per-thread list instead, so location threads parse concurrently.
+    """
+    capture = threading.local()
+    showwarning = warnings.showwarning
+    def route(message, category, filename, lineno, file=None, line=None):
+        if issubclass(category, pd.errors.ParserWarning):
+            caught = getattr(capture, "messages", None)
+            if caught is not None:
+                caught.append(str(message))
+            return  # Outside an ingest they stay silent, like other warnings
+        showwarning(message, category, filename, lineno, file, line)
+    warnings.showwarning = route
+    return capture
+
+@st.cache_data(show_spinner=False)
+def infer_csv_schema(path, kind, header):
+    """
+    Infer and validate a CSV's schema from a sample of rows.
     
-    if available_files:
-        st.sidebar.info("✅ Loading from local `/data` folder")
+    Cached on the header line, so each source is only inspected again
+    when its columns change.
+    """
+    sample = pd.read_csv(path, nrows=SCHEMA_SAMPLE_ROWS, engine='c', on_bad_lines='skip')
+    columns = list(sample.columns)
+    
+    # Low-cardinality columns are parsed straight into categoricals
+    dtypes = {col: 'category' for col, dtype in COMPACT_SCHEMA.get(kind, {}).items()
+              if dtype == 'category' and col in columns}
+    missing = [col for col in REQUIRED_COLUMNS.get(kind, []) if col not in columns]
+    
+    text_column = None
+    if kind == "reviews":
+        text_column = detect_text_column(sample)
+        if text_column is None:
+            missing.append("review text")
+        else:
+            dtypes.pop(text_column, None)
+    return {"columns": columns, "dtypes": dtypes, "text_column": text_column, "missing": missing}
+
+def collect_bad_rows(path, reasons):
+    """
+    Fetch the records the C parser skipped, in one streaming csv.reader pass.
+    
+    "Skipping line N" counts records (a quoted field may span several
+    physical lines), which is also how csv.reader numbers its rows; only
+    the wanted records are kept and no frame is built.
+    """
+    bad_rows = []
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        for record, fields in enumerate(csv.reader(f), start=1):
+            if record in reasons:
+                buffer = io.StringIO()
+                csv.writer(buffer, lineterminator='').writerow(fields)
+                bad_rows.append({'record': record, 'reason': reasons[record], 'raw': buffer.getvalue()})
+                if len(bad_rows) == len(reasons):
+                    break
+    return bad_rows
+
+def write_quarantine(path, bad_rows):
+    """Write malformed rows to the quarantine folder; returns the quarantine file"""
+    QUARANTINE_DIR.mkdir(parents=True, exist_ok=True)
+    quarantine_file = QUARANTINE_DIR / f"{path.parent.name}_{path.stem}_quarantine.csv"
+    pd.DataFrame(bad_rows, columns=['record', 'reason', 'raw']).to_csv(quarantine_file, index=False)
+    return quarantine_file
+
+def ingest_csv(path, kind):
+    """
+    Parse a CSV with pandas' C engine using the inferred schema.
+    
+    Malformed rows are not silently dropped: they are written to the
+    quarantine folder and counted. Returns (frame, report, messages).
+    """
+    started = time.perf_counter()
+    messages = []
+    with open(path, encoding='utf-8', errors='replace') as f:
+        header = f.readline()
+    schema = infer_csv_schema(str(path), kind, header)
+    if schema["missing"]:
+        messages.append(("warning", f"⚠️ {path.name} is missing expected columns: {', '.join(schema['missing'])}"))
+    
+    capture = get_parser_warning_router()
+    capture.messages = []
+    try:
+        frame = pd.read_csv(path, engine='c', on_bad_lines='warn', dtype=schema["dtypes"], low_memory=False)
+    finally:
+        caught, capture.messages = capture.messages, None
+    
+    reasons = {int(match.group(1)): match.group(2).strip()
+               for message in caught for match in BAD_LINE_PATTERN.finditer(message)}
+    
+    quarantine_file = None
+    bad_rows = []
+    if reasons:
+        # Only files the fast parse flagged pay for the second pass
+        bad_rows = collect_bad_rows(path, reasons)
+        quarantine_file = write_quarantine(path, bad_rows)
+        messages.append(("warning", f"⚠️ {len(bad_rows)} malformed rows in {path.name} were quarantined to `{quarantine_file.name}`"))
+    
+    seconds = max(time.perf_counter() - started, 1e-9)
+    size_mb = path.stat().st_size / 1024 ** 2
+    report = {
+        'file': path.name,
+        'rows': len(frame),
+        'quarantined': len(bad_rows),
+        'seconds': round(seconds, 3),
+        'rows_per_sec': int(len(frame) / seconds),
+        'mb_per_sec': round(size_mb / seconds, 1),
+        'quarantine_file': quarantine_file.name if quarantine_file else "",
+    }
+    return frame, report, messages
+
+def load_local_data(available_files):
+    """Ingest reviews, POS and inventory CSVs; returns frames, UI messages and ingest reports"""
+    df = pd.DataFrame()
+    df_pos = pd.DataFrame()
+    df_inv = pd.DataFrame()
+    messages = []
+    reports = []
     
     # Load Reviews
     reviews_file = available_files.get("restaurant_reviews") or available_files.get("reviews") or available_files.get("mapped_reviews_export")
     if reviews_file:
         try:
-            df = pd.read_csv(reviews_file, on_bad_lines='skip', engine='python')
+            df, report, issues = ingest_csv(reviews_file, "reviews")
+            reports.append(report)
+            messages.extend(issues)
         except Exception as e:
-            st.error(f"❌ Error reading reviews file: {e}")
+            messages.append(("error", f"❌ Error reading reviews file: {e}"))
             df = pd.DataFrame()
     
     # Load POS
     pos_file = available_files.get("pos_sales") or available_files.get("pos")
     if pos_file:
         try:
-            df_pos = pd.read_csv(pos_file)
+            df_pos, report, issues = ingest_csv(pos_file, "pos")
+            reports.append(report)
+            messages.extend(issues)
         except Exception as e:
-            st.warning(f"⚠️ Could not load POS data: {e}")
+            messages.append(("warning", f"⚠️ Could not load POS data: {e}"))
             df_pos = pd.DataFrame()
     
     # Load Inventory
     inv_file = available_files.get("inventory")
     if inv_file:
         try:
-            df_inv = pd.read_csv(inv_file)
+            df_inv, report, issues = ingest_csv(inv_file, "inventory")
+            reports.append(report)
+            messages.extend(issues)
         except Exception as e:
-            st.warning(f"⚠️ Could not load inventory data: {e}")
+            messages.append(("warning", f"⚠️ Could not load inventory data: {e}"))
             df_inv = pd.DataFrame()
+    
+    return df, df_pos, df_inv, messages, reports
 
-if df.empty and df_pos.empty and df_inv.empty:
-    st.error(f"❌ No data found. Configure Google Sheets or add CSV files to `/data` folder")
-    st.stop()
+def load_sheets_data(location):
+    """Read reviews, POS and inventory from a location's Google Sheets"""
+    df = load_from_google_sheets(location["reviews_sheet_id"], "restaurant_reviews")
+    df_pos = load_from_google_sheets(location["pos_sheet_id"], "pos_sales")
+    df_inv = load_from_google_sheets(location["inventory_sheet_id"], "inventory")
+    return df, df_pos, df_inv, [], []
 
-# ----------------------------------------------------------
-# Process data
-# ----------------------------------------------------------
-# Detect text column
-if not df.empty:
+def detect_text_column(df):
+    """Find the column holding the review text"""
+    if df.empty:
+        return None
+    
     possible_names = ['text', 'review_text', 'review', 'content', 'comment', 'message', 'description']
     for col in possible_names:
         if col in df.columns:
-            text_column = col
-            break
+            return col
+    
+    # If still not found, use the string column with the longest values
+    best_col, best_length = None, 0
+    for col in df.columns:
+        if df[col].dtype == 'object' or pd.api.types.is_string_dtype(df[col].dtype):
+            length = df[col].astype(str).str.len().mean()
+            if best_col is None or length > best_length:
+                best_col, best_length = col, length
+    return best_col
+
+def enrich_reviews(df, text_column, progress=None):
+    """Add dish, sentiment and sentiment_label columns to the reviews frame"""
+    if df.empty:
+        return df
+    
+    df = df.copy()
+    if text_column and text_column in df.columns:
+        # Dish extraction and sentiment run chunk by chunk in the compute pool
+        texts = df[text_column].astype(str).tolist()
+        chunks = [texts[start:start + ENRICH_CHUNK_ROWS] for start in range(0, len(texts), ENRICH_CHUNK_ROWS)]
+        results = get_compute_pool().map(enrich_texts, chunks, progress)
+        df["dish"] = [dish for dishes, _ in results for dish in dishes]
+        df["sentiment"] = [score for _, scores in results for score in scores]
+        
+        df["sentiment_label"] = df["sentiment"].apply(lambda x: "Positive" if x>0.1 else "Negative" if x<-0.1 else "Neutral")
+    else:
+        # If no suitable text column, create default values
+        df["dish"] = "Unknown"
+        df["sentiment"] = 0
+        df["sentiment_label"] = "Neutral"
+    return df
+
+def get_daily_sales(pos_df):
+    """Total quantity sold per day, sorted by date"""
+    if pos_df.empty or 'date' not in pos_df.columns or 'qty' not in pos_df.columns:
+        return pd.Series(dtype='float64')
+    dates = pd.to_datetime(pos_df['date'], errors='coerce')
+    return pos_df['qty'].groupby(dates).sum().sort_index()
+
+def load_raw_data(location, source):
+    """Read a location's raw frames; returns (df, df_pos, df_inv, messages, ingest reports)"""
+    if source == "sheets":
+        return load_sheets_data(location)
+    return load_local_data(find_local_files(location["data_dir"]))
+
+def get_location_summary(df, df_pos, alerts):
+    """Headline totals for one location, kept additive for the roll-up"""
+    sentiment_sum = float(df["sentiment"].sum()) if "sentiment" in df.columns else 0.0
+    positive_count = int((df["sentiment_label"] == "Positive").sum()) if "sentiment_label" in df.columns else 0
+    items_sold = float(df_pos["qty"].sum()) if "qty" in df_pos.columns else 0.0
+    if "qty" in df_pos.columns and "price" in df_pos.columns:
+        revenue = float((df_pos["qty"] * df_pos["price"]).sum())
+    else:
+        revenue = 0.0
+    return {
+        "reviews": len(df),
+        "sentiment_sum": sentiment_sum,
+        "positive_count": positive_count,
+        "items_sold": items_sold,
+        "revenue": revenue,
+        "critical_alerts": sum(1 for alert in alerts if alert['type'] == 'danger'),
+        "warning_alerts": sum(1 for alert in alerts if alert['type'] == 'warning'),
+    }
+
+def build_datasets(raw, version, previous=None, dedup_index=None, snapshot_path=None, progress=None):
+    """Enrich and aggregate raw frames into the bundle shared by all sessions"""
+    df, df_pos, df_inv, messages, ingest_reports = raw
+    
+    text_column = detect_text_column(df)
+    df, dedup_report = dedup_reviews(df, text_column, dedup_index)
+    df = apply_compact_schema(enrich_reviews(df, text_column, progress), "reviews")
+    df_pos = apply_compact_schema(df_pos, "pos")
+    df_inv = apply_compact_schema(df_inv, "inventory")
+    
+    partials = get_dish_partials(df, df_pos)
+    alerts = generate_inventory_alerts(df_inv, df_pos)
+    daily_sales = get_daily_sales(df_pos)
+    forecast = get_compute_pool().run(forecast_sales, daily_sales.to_numpy(), 14) if len(daily_sales) > 4 else None
+    
+    return {
+        "version": version,
+        "version_id": hashlib.sha1(repr(version).encode()).hexdigest()[:8],
+        "built_at": datetime.now(),
+        "df": df,
+        "df_pos": df_pos,
+        "df_inv": df_inv,
+        "text_column": text_column,
+        "partials": partials,
+        "performance": get_performance_from_partials(partials),
+        "alerts": alerts,
+        "demand_stats": get_demand_stats(df_pos),
+        "trends": update_trends(previous["trends"] if previous else None, df, df_pos),
+        "snapshots": update_snapshots(snapshot_path, df, df_pos),
+        "summary": get_location_summary(df, df_pos, alerts),
+        "daily_sales": daily_sales,
+        "forecast": forecast,
+        "messages": messages,
+        "build_messages": messages,
+        "ingest": pd.DataFrame(ingest_reports),
+        "dedup": dedup_report,
+        "figures": {},
+    }
+
+def refresh_datasets(key, current=None, progress=None):
+    """Rebuild the bundle for a (location, source) key; returns None when unchanged"""
+    name, source = key
+    location = load_location_registry()[name]
+    failure = []
+    if source == "sheets":
+        try:
+            raw = load_raw_data(location, source)
+        except Exception as e:
+            failure = [("warning", f"⚠️ Could not load from Google Sheets: {str(e)[:150]}")]
+            if current is not None:
+                # Keep serving the last good version, with the failure attached
+                return dict(current, messages=current["build_messages"] + failure)
+            raw, version = (pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), [], []), None
+        else:
+            version = frames_fingerprint(raw[:3])
+        if current is not None and current["version"] == version:
+            if current["messages"] != current["build_messages"]:
+                return dict(current, messages=current["build_messages"])  # Recovered, data unchanged
+            return None
+    else:
+        version = local_data_version(find_local_files(location["data_dir"]))
+        if current is not None and current["version"] == version:
+            return None
+        raw = load_raw_data(location, source)
+    file_stem = f"{hashlib.sha1(name.encode()).hexdigest()[:12]}_{source}"
+    dedup_index = DEDUP_INDEX_DIR / f"{file_stem}_v{DEDUP_INDEX_FORMAT}.npz"
+    snapshot_path = SNAPSHOT_DIR / f"{file_stem}.npz"
+    bundle = build_datasets(raw, version, current, dedup_index, snapshot_path, progress)
+    if failure:
+        # Placeholder for a first load that failed: the warning is not part of the build
+        bundle["messages"] = bundle["build_messages"] + failure
+    return bundle
+
+def rollup_locations(bundles):
+    """Combine per-location partial aggregates into one ranking and a comparison table"""
+    partials = [bundle["partials"] for bundle in bundles.values() if not bundle["partials"].empty]
+    if partials:
+        combined = pd.concat(partials).groupby(level=0).sum()
+    else:
+        combined = pd.DataFrame()
     
-    # If still not found, use first string column
-    if text_column is None:
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                text_column = col
-                break
+    rows = []
+    for name, bundle in bundles.items():
+        summary = bundle["summary"]
+        rows.append({
+            "location": name,
+            "reviews": summary["reviews"],
+            "avg_sentiment": round(summary["sentiment_sum"] / max(summary["reviews"], 1), 3),
+            "positive_pct": round(summary["positive_count"] / max(summary["reviews"], 1) * 100, 1),
+            "items_sold": summary["items_sold"],
+            "revenue": round(summary["revenue"], 2),
+            "critical_alerts": summary["critical_alerts"],
+            "warning_alerts": summary["warning_alerts"],
+        })
+    return get_performance_from_partials(combined), pd.DataFrame(rows)
+
+class DataRefresher:
+    """
+    Process-wide store of the latest dataset bundle per (location, source).
+    
+    A daemon thread polls every watched key on its source's schedule and
+    rebuilds off the request path, one location per pool thread; new
+    bundles are swapped in atomically, so sessions only ever read a
+    complete, read-only version. The threads overlap I/O and pandas work;
+    the CPU-heavy review analysis runs in the ComputePool's processes.
+    """
+    
+    POLL_SECONDS = {"local": LOCAL_REFRESH_SECONDS, "sheets": SHEETS_REFRESH_SECONDS}
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self._bundles = {}
+        self._last_poll = {}
+        self._pool = ThreadPoolExecutor(max_workers=max(LOCATION_WORKERS, 1), thread_name_prefix="location")
+        self._thread = threading.Thread(target=self._run, name="data-refresher", daemon=True)
+        self._thread.start()
+    
+    def peek(self, key):
+        """Latest published bundle for a key, or None"""
+        with self._lock:
+            return self._bundles.get(key)
+    
+    def get_or_build(self, key, progress=None):
+        """Latest bundle, building it synchronously only on the very first request"""
+        bundle = self.peek(key)
+        if bundle is not None:
+            return bundle
+        # Single-flight: concurrent first requests wait for one build
+        with self._build_lock(key):
+            bundle = self.peek(key)
+            if bundle is None:
+                bundle = refresh_datasets(key, progress=progress)
+                self._publish(key, bundle)
+        return bundle
+    
+    def get_or_build_many(self, keys):
+        """Bundles for several locations, missing ones built concurrently on the location threads"""
+        return dict(zip(keys, self._pool.map(self.get_or_build, keys)))
+    
+    def _build_lock(self, key):
+        with self._lock:
+            return self._build_locks.setdefault(key, threading.Lock())
+    
+    def _publish(self, key, bundle):
+        with self._lock:
+            self._bundles[key] = bundle
+            self._last_poll[key] = time.monotonic()
+    
+    def _refresh(self, key):
+        with self._build_lock(key):
+            try:
+                bundle = refresh_datasets(key, self.peek(key))
+            except Exception:
+                bundle = None  # Keep serving the last good version
+            if bundle is not None:
+                self._publish(key, bundle)
+            else:
+                with self._lock:
+                    self._last_poll[key] = time.monotonic()
+    
+    def _run(self):
+        while True:
+            time.sleep(min(self.POLL_SECONDS.values()))
+            with self._lock:
+                due = [key for key in self._bundles
+                       if time.monotonic() - self._last_poll.get(key, 0) >= self.POLL_SECONDS[key[1]]]
+            list(self._pool.map(self._refresh, due))
+
+@st.cache_resource
+def get_data_refresher():
+    """Single DataRefresher (and background thread) per server process"""
+    return DataRefresher()
+
+if hasattr(st, "fragment"):
+    @st.fragment(run_every=LOCAL_REFRESH_SECONDS)
+    def watch_data_version(keys, version_ids):
+        """Rerun the session as soon as the refresher publishes a new version"""
+        refresher = get_data_refresher()
+        for key, version_id in zip(keys, version_ids):
+            latest = refresher.peek(key)
+            if latest is not None and latest["version_id"] != version_id:
+                st.rerun()
+else:
+    def watch_data_version(keys, version_ids):
+        """Older Streamlit: new versions are picked up on the next interaction"""
+        return None
 
 # ----------------------------------------------------------
-# Sentiment and Dish Analysis
+# Main Dashboard UI
 # ----------------------------------------------------------
-if not df.empty and text_column and text_column in df.columns:
-    df["dish"] = df[text_column].apply(extract_dish)
+st.title("🍽️ Restaurant AI Dashboard")
+st.markdown("*Real-time insights powered by AI — Local Compute + OpenRouter LLM*")
+
+# ----------------------------------------------------------
+# Load data from Google Sheets OR CSV files
+# ----------------------------------------------------------
+st.sidebar.markdown("## 📊 Data Source")
+data_source = st.sidebar.radio(
+    "Choose data source:",
+    ["📁 Local CSV Files", "📊 Google Sheets"],
+    help="Switch between local files and live Google Sheets data"
+)
+
+locations = load_location_registry()
+if len(locations) > 1:
+    selected_location = st.sidebar.selectbox("🏪 Location:", [ALL_LOCATIONS] + list(locations),
+                                             help="Pick one restaurant or compare all of them")
+else:
+    selected_location = next(iter(locations))
+
+def source_for(location):
+    """Use a location's Google Sheets only when selected and configured"""
+    if data_source == "📊 Google Sheets" and location["reviews_sheet_id"] and GOOGLE_SHEETS_ENABLED:
+        return "sheets"
+    return "local"
+
+refresher = get_data_refresher()
+
+# ==================== ROLL-UP: ALL LOCATIONS ====================
+if selected_location == ALL_LOCATIONS:
+    keys = [(name, source_for(location)) for name, location in locations.items()]
+    with st.spinner(f"📥 Loading {len(keys)} locations..."):
+        bundles = refresher.get_or_build_many(keys)
+    watch_data_version(keys, [bundles[key]["version_id"] for key in keys])
     
-    # Sentiment analysis with fallback
-    if TEXTBLOB_INSTALLED:
-        df["sentiment"] = df[text_column].apply(lambda x: TextBlob(str(x)).sentiment.polarity)
-    else:
-        # Simple sentiment fallback without TextBlob
-        def simple_sentiment(text):
-            positive_words = ['good', 'great', 'excellent', 'love', 'amazing', 'delicious', 'perfect', 'wonderful', 'fantastic', 'awesome']
-            negative_words = ['bad', 'terrible', 'hate', 'awful', 'horrible', 'poor', 'worst', 'disgusting', 'nasty']
-            text_lower = str(text).lower()
-            pos_count = sum(text_lower.count(word) for word in positive_words)
-            neg_count = sum(text_lower.count(word) for word in negative_words)
-            if pos_count + neg_count == 0:
-                return 0
-            return (pos_count - neg_count) / (pos_count + neg_count)
-        
-        df["sentiment"] = df[text_column].apply(simple_sentiment)
-    
-    df["sentiment_label"] = df["sentiment"].apply(lambda x: "Positive" if x>0.1 else "Negative" if x<-0.1 else "Neutral")
-elif not df.empty:
-    # If no suitable text column, create default values
-    df["dish"] = "Unknown"
-    df["sentiment"] = 0
-    df["sentiment_label"] = "Neutral"
+    rollup_performance, location_table = rollup_locations({key[0]: bundle for key, bundle in bundles.items()})
+    
+    st.subheader("🌐 All Locations")
+    st.markdown("""<div class="explanation">
+    💡 Compare your restaurants side by side. Dish scores below combine reviews and sales from every location.
+    </div>""", unsafe_allow_html=True)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("🏪 Locations", len(location_table))
+    with col2:
+        st.metric("📝 Total Reviews", int(location_table["reviews"].sum()))
+    with col3:
+        st.metric("📦 Items Sold", int(location_table["items_sold"].sum()))
+    
+    location_table.columns = ['🏪 Location', '📝 Reviews', '😊 Happiness', '👍 Positive %', '📦 Sold', '💰 Revenue', '🚨 Critical', '⚠️ Warnings']
+    st.dataframe(location_table, use_container_width=True, hide_index=True)
+    
+    if not rollup_performance.empty:
+        st.divider()
+        st.subheader("🏆 Dish Performance Across All Locations")
+        ranking_df = rollup_performance[['avg_sentiment', 'review_count', 'positive_count', 'total_qty', 'overall_score']].copy()
+        ranking_df.columns = ['😊 Happiness', '📝 Reviews', '👍 Positive', '📦 Sold', '⭐ Score']
+        st.dataframe(ranking_df.round(1), use_container_width=True, height=400)
+    st.stop()
+
+# ==================== SINGLE LOCATION ====================
+location = locations[selected_location]
+if data_source == "📊 Google Sheets" and source_for(location) == "local":
+    st.warning("❌ Google Sheets integration not configured. Using local CSV files instead.")
+
+source = source_for(location)
+data_key = (selected_location, source)
+if source == "sheets":
+    st.sidebar.info("✅ Loading from Google Sheets")
+elif find_local_files(location["data_dir"]):
+    st.sidebar.info(f"✅ Loading from local `/{location['data_dir'].name}` folder")
+
+# Shared, read-only bundle kept fresh by the background refresher
+with st.spinner("📥 Loading and analysing data..."):
+    data = refresher.peek(data_key)
+    if data is None:
+        # First build: show review analysis progress while the worker pool runs
+        build_progress = st.progress(0.0, text="🧠 Analysing reviews...")
+        data = refresher.get_or_build(data_key, progress=lambda done, total: build_progress.progress(
+            done / total, text=f"🧠 Analysing reviews... {done}/{total} batches"))
+        build_progress.empty()
+watch_data_version([data_key], [data["version_id"]])
+for level, message in data["messages"]:
+    getattr(st, level)(message)
+
+df = data["df"]
+df_pos = data["df_pos"]
+df_inv = data["df_inv"]
+text_column = data["text_column"]
+
+if source == "sheets" and df.empty and df_pos.empty and df_inv.empty:
+    st.warning("""
+    ❌ Google Sheets not configured. 
+    
+    To enable Google Sheets integration:
+    1. Create sheets at https://sheets.google.com
+    2. Get your Sheet IDs
+    3. Add to Streamlit Cloud Secrets:
+       - GOOGLE_REVIEWS_SHEET_ID=your_id
+       - GOOGLE_POS_SHEET_ID=your_id
+       - GOOGLE_INVENTORY_SHEET_ID=your_id
+    """)
+
+if df.empty and df_pos.empty and df_inv.empty:
+    st.error(f"❌ No data found. Configure Google Sheets or add CSV files to `/data` folder")
+    st.stop()
+
+if not data["ingest"].empty:
+    with st.sidebar.expander("📥 Ingest Report"):
+        st.dataframe(data["ingest"], use_container_width=True, hide_index=True)
+        if data["ingest"]["quarantined"].sum():
+            st.caption(f"Quarantined rows are kept in `{QUARANTINE_DIR}`")
+
+dedup_report = data["dedup"]
+if dedup_report['kept'] < dedup_report['rows']:
+    with st.sidebar.expander("🧹 Duplicate Reviews"):
+        st.caption(f"{dedup_report['rows'] - dedup_report['kept']} duplicate reviews removed, "
+                   f"{dedup_report['kept']} of {dedup_report['rows']} kept "
+                   f"(new this refresh: {dedup_report['exact_duplicates']} exact, {dedup_report['near_duplicates']} near).")
+
+with st.sidebar.expander("🧠 Memory Usage"):
+    st.caption(f"Shared data version: `{data['version_id']}` (built {data['built_at']:%H:%M:%S})")
+    st.dataframe(memory_report({"reviews": df, "pos": df_pos, "inventory": df_inv}),
+                 use_container_width=True, hide_index=True)
 
 # ----------------------------------------------------------
 # Dashboard Tabs
 # ----------------------------------------------------------
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Overview", "🏆 Dish Performance", "📦 Inventory", "📈 Forecasting", "🔍 Reviews"])
+# Only the selected view is rendered, so hidden tabs cost nothing on rerun
+TAB_NAMES = ["📊 Overview", "🏆 Dish Performance", "📦 Inventory", "📈 Forecasting", "📉 Trends", "🔍 Reviews"]
+active_tab = st.radio("View", TAB_NAMES, horizontal=True, label_visibility="collapsed", key="active_tab")
 
 # ==================== TAB 1: OVERVIEW ====================
-with tab1:
+if active_tab == "📊 Overview":
     st.subheader("📊 Dashboard Overview")
     st.markdown("""<div class="explanation">
     💡 This page gives you a quick snapshot of your restaurant's performance today. 
@@ -567,29 +2042,21 @@ with tab1:
         col1, col2 = st.columns(2)
         with col1:
             if "sentiment_label" in df.columns:
-                sentiment_counts = df["sentiment_label"].value_counts()
-                fig = px.pie(sentiment_counts, values=sentiment_counts.values, names=sentiment_counts.index, 
-                            title="How Customers Feel About Your Restaurant", hole=0.3,
-                            color_discrete_map={"Positive": "#4caf50", "Negative": "#f44", "Neutral": "#9e9e9e"})
-                fig.update_traces(textposition='inside', textinfo='percent+label')
+                fig = get_cached_figure(data, "sentiment_pie", build_sentiment_pie, df)
                 st.plotly_chart(fig, use_container_width=True)
                 st.markdown(f"<div class='explanation'>{EXPLANATIONS['sentiment']}</div>", unsafe_allow_html=True)
         
         with col2:
             # Top dishes
             if "dish" in df.columns:
-                top_dishes = df["dish"].value_counts().head(10)
-                fig = px.bar(x=top_dishes.values, y=top_dishes.index, orientation='h',
-                            title="Most Talked About Dishes", labels={"x": "Number of Reviews", "y": "Dish"},
-                            color=top_dishes.values, color_continuous_scale='viridis')
-                fig.update_layout(height=400, showlegend=False)
+                fig = get_cached_figure(data, "top_dishes", build_top_dishes_bar, df)
                 st.plotly_chart(fig, use_container_width=True)
                 st.markdown("<div class='explanation'>📊 Which dishes are customers talking about the most?</div>", unsafe_allow_html=True)
     else:
         st.warning("❌ No review data found. Please check your CSV files.")
 
 # ==================== TAB 2: DISH PERFORMANCE ====================
-with tab2:
+if active_tab == "🏆 Dish Performance":
     st.subheader("🏆 Which Dishes Are Your Stars?")
     st.markdown("""<div class="explanation">
     💡 This page shows you which dishes customers love the most and which ones might need improvement.
@@ -597,7 +2064,7 @@ with tab2:
     </div>""", unsafe_allow_html=True)
     
     if not df.empty:
-        performance = get_dish_performance(df, df_pos)
+        performance = data["performance"]
         
         if not performance.empty:
             # Ranking table with plain language
@@ -607,6 +2074,18 @@ with tab2:
             
             st.dataframe(ranking_df, use_container_width=True, height=400)
             
+            # Time travel: compare two stored daily snapshots
+            compare_label = st.selectbox("📅 Compare with:", list(COMPARE_PERIODS),
+                                         help="How scores and ranks changed, from saved daily snapshots")
+            comparison, latest_day, then_day = compare_snapshots(data["snapshots"], COMPARE_PERIODS[compare_label])
+            if not comparison.empty:
+                change_df = comparison[['overall_score_now', 'overall_score_then', 'score_change', 'rank_now', 'rank_then', 'rank_change']].copy()
+                change_df.columns = ['⭐ Score', '⭐ Before', '± Score', '🏅 Rank', '🏅 Before', '▲ Places']
+                st.caption(f"Snapshot of {latest_day:%b %d, %Y} vs {then_day:%b %d, %Y}")
+                st.dataframe(change_df, use_container_width=True, height=300)
+            else:
+                st.caption("ℹ️ Not enough daily snapshots yet for this comparison.")
+            
             st.markdown("""
             **How to read this table:**
             - 😊 Happiness: Average customer satisfaction (-1 to +1, higher is better)
@@ -621,31 +2100,57 @@ with tab2:
             # Performance chart
             col1, col2 = st.columns(2)
             with col1:
-                fig = px.bar(performance.reset_index(), x='overall_score', y=performance.index, 
-                           orientation='h', title="⭐ Dish Performance Scores",
-                           labels={"overall_score": "Performance Score (0-100)", "dish": "Dish"},
-                           color='overall_score', color_continuous_scale='RdYlGn',
-                           text='overall_score')
-                fig.update_traces(textposition='auto')
+                fig = get_cached_figure(data, "performance_bar", build_performance_bar, performance)
                 st.plotly_chart(fig, use_container_width=True)
                 st.markdown("<div class='explanation'>🟢 Green = Great! 🟡 Yellow = OK 🔴 Red = Needs work</div>", unsafe_allow_html=True)
             
             with col2:
-                fig = px.scatter(performance.reset_index(), x='avg_sentiment', y='total_qty', size='review_count',
-                               title="💰 Happiness vs Sales", hover_data=['review_count'],
-                               labels={"avg_sentiment": "Customer Satisfaction", "total_qty": "Items Sold", "review_count": "Reviews"},
-                               color='overall_score', color_continuous_scale='viridis')
-                fig.add_hline(y=0)
-                fig.add_vline(x=0)
+                fig = get_cached_figure(data, "happiness_scatter", build_happiness_scatter, performance)
                 st.plotly_chart(fig, use_container_width=True)
                 st.markdown("<div class='explanation'>📈 Top right = Happy customers + High sales = Star dish!</div>", unsafe_allow_html=True)
+            
+            st.divider()
+            
+            st.subheader("🎛️ Scoring Scenarios")
+            st.markdown("""<div class="explanation">
+            💡 The score above weights Happiness 40%, Reviews 30% and Sales 30%. Try your own weights,
+            or sweep every combination to see which dishes stay on top no matter how you score them.
+            </div>""", unsafe_allow_html=True)
+            
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                sentiment_weight = st.slider("😊 Happiness weight:", 0.0, 1.0, DEFAULT_SCORE_WEIGHTS[0], 0.05)
+            with col2:
+                popularity_weight = st.slider("📝 Reviews weight:", 0.0, 1.0, DEFAULT_SCORE_WEIGHTS[1], 0.05)
+            with col3:
+                sales_weight = st.slider("📦 Sales weight:", 0.0, 1.0, DEFAULT_SCORE_WEIGHTS[2], 0.05)
+            with col4:
+                normalization = st.selectbox("📏 Scale:", list(NORMALIZATIONS), format_func=lambda key: NORMALIZATIONS[key])
+            
+            scores, ranks, _ = evaluate_scenarios(performance, [[sentiment_weight, popularity_weight, sales_weight]], [normalization])
+            if not scores.empty:
+                custom_df = pd.DataFrame({'⭐ Score': scores[0].round(1), '🏅 Rank': ranks[0]}).sort_values('🏅 Rank')
+                st.dataframe(custom_df, use_container_width=True, height=300)
+            
+            with st.expander("🔬 Sweep all weightings"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    step = st.select_slider("Weight step:", options=[0.25, 0.1, 0.05, 0.02], value=0.1)
+                with col2:
+                    sweep_scales = st.multiselect("Scales:", list(NORMALIZATIONS), default=list(NORMALIZATIONS))
+                scores, ranks, scenarios = evaluate_scenarios(performance, weight_grid(step), sweep_scales)
+                if not ranks.empty:
+                    st.caption(f"{len(scenarios):,} scenarios evaluated")
+                    sweep_df = summarize_scenario_ranks(ranks)
+                    sweep_df.columns = ['🏅 Best', '🏅 Median', '🏅 Worst', '🔝 % in Top 5']
+                    st.dataframe(sweep_df, use_container_width=True, height=300)
         else:
             st.info("ℹ️ Not enough data for performance analysis yet. Check back after more reviews!")
     else:
         st.warning("❌ No review data available")
 
 # ==================== TAB 3: INVENTORY ====================
-with tab3:
+if active_tab == "📦 Inventory":
     st.subheader("📦 Check Your Stock Levels")
     st.markdown("""<div class="explanation">
     💡 Keep an eye on your inventory! This page warns you before items run out so you can reorder in time.
@@ -654,7 +2159,7 @@ with tab3:
     
     if not df_inv.empty:
         # Generate alerts
-        alerts = generate_inventory_alerts(df_inv, df_pos)
+        alerts = data["alerts"]
         
         if alerts:
             st.subheader("⚠️ Stock Alerts")
@@ -675,17 +2180,49 @@ with tab3:
         
         # Stock visualization
         if 'qty_on_hand' in df_inv.columns and 'item' in df_inv.columns:
-            fig = px.bar(df_inv.sort_values('qty_on_hand', ascending=True), 
-                        x='qty_on_hand', y='item', orientation='h',
-                        title="📊 Stock Levels (Green = Good, Red = Low)",
-                        labels={"qty_on_hand": "Quantity in Stock", "item": "Item"},
-                        color='qty_on_hand', color_continuous_scale='RdYlGn')
+            fig = get_cached_figure(data, "stock_bar", build_stock_bar, df_inv)
             st.plotly_chart(fig, use_container_width=True)
+        
+        # Reorder planner
+        st.divider()
+        st.subheader("🛒 Reorder Planner")
+        st.markdown("""<div class="explanation">
+        💡 When to reorder and how much, based on how fast each item sells and how much that varies day to day.
+        Reorder Point = Daily Demand × Lead Time + Safety Stock
+        </div>""", unsafe_allow_html=True)
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            lead_time_days = st.slider("🚚 Supplier lead time (days):", 1, 30, 3)
+        with col2:
+            service_level = st.selectbox("🎯 Service level:", list(SERVICE_LEVEL_Z), index=1,
+                                         help="How often you want to avoid running out while waiting for a delivery")
+        with col3:
+            review_days = st.slider("📅 Days between orders:", 1, 30, 7)
+        
+        plan = plan_replenishment(df_inv, data["demand_stats"], lead_time_days, service_level, review_days)
+        if not plan.empty:
+            to_order = plan[plan['suggested_qty'] > 0].sort_values('days_of_cover')
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("🛒 Items to Reorder", len(to_order))
+            with col2:
+                st.metric("💰 Order Value", f"${to_order['order_value'].sum():,.2f}")
+            
+            if not to_order.empty:
+                st.dataframe(to_order, use_container_width=True, hide_index=True)
+            else:
+                st.success("✅ Nothing needs reordering with these settings.")
+            
+            with st.expander("🔮 What if the lead time changes?"):
+                st.dataframe(what_if_lead_times(df_inv, data["demand_stats"], sorted(set(WHAT_IF_LEAD_TIMES + [lead_time_days])),
+                                                service_level, review_days),
+                             use_container_width=True, hide_index=True)
     else:
         st.info("ℹ️ No inventory data loaded. Upload inventory.csv to see stock alerts.")
 
 # ==================== TAB 4: FORECASTING ====================
-with tab4:
+if active_tab == "📈 Forecasting":
     st.subheader("📈 Predict Your Sales")
     st.markdown("""<div class="explanation">
     💡 This predicts what you'll sell in the next 2 weeks based on your recent sales patterns.
@@ -697,14 +2234,11 @@ with tab4:
         st.info("Other features are working fine. This is an optional advanced feature.")
     elif not df_pos.empty and 'date' in df_pos.columns and 'qty' in df_pos.columns:
         try:
-            # Prepare time series data
-            df_pos_copy = df_pos.copy()
-            df_pos_copy['date'] = pd.to_datetime(df_pos_copy['date'], errors='coerce')
-            daily_sales = df_pos_copy.groupby('date')['qty'].sum().sort_index()
+            # Daily series and forecast come precomputed from the shared cache
+            daily_sales = data["daily_sales"]
             
             if len(daily_sales) > 4:
-                # Forecast
-                forecast_values = forecast_sales(daily_sales.values, periods=14)
+                forecast_values = data["forecast"]
                 
                 if forecast_values is not None and len(forecast_values) > 0:
                     # Create forecast dataframe
@@ -716,16 +2250,7 @@ with tab4:
                     })
                     
                     # Plot
-                    fig = go.Figure()
-                    fig.add_trace(go.Scatter(x=daily_sales.index, y=daily_sales.values, 
-                                           mode='lines', name='Your Past Sales', 
-                                           line=dict(color='blue', width=3)))
-                    fig.add_trace(go.Scatter(x=forecast_df['date'], y=forecast_df['forecast'],
-                                           mode='lines+markers', name='Predicted Sales',
-                                           line=dict(color='orange', width=3, dash='dash')))
-                    fig.update_layout(title="📊 Sales Forecast (Next 14 Days)", 
-                                    xaxis_title="Date", yaxis_title="Items to Sell", 
-                                    height=400, hovermode='x unified')
+                    fig = get_cached_figure(data, "forecast", build_forecast_chart, daily_sales, forecast_df)
                     st.plotly_chart(fig, use_container_width=True)
                     
                     # Statistics
@@ -757,8 +2282,49 @@ with tab4:
     else:
         st.info("ℹ️ Forecasting needs sales data with 'date' and 'qty' columns. Check your POS file.")
 
+# ==================== TAB: TRENDS ====================
+if active_tab == "📉 Trends":
+    st.subheader("📉 Spot Sudden Changes")
+    st.markdown(f"""<div class="explanation">
+    💡 Each day is compared with the {TREND_WINDOW_DAYS} days before it. Days that are far outside the usual range
+    (a sudden drop in happiness for a dish, or a spike in sales) are flagged so you can look into them.
+    </div>""", unsafe_allow_html=True)
+    
+    trends = data["trends"]
+    recent = get_recent_anomalies(trends)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        count = len(recent[recent['metric'] == 'sentiment']) if not recent.empty else 0
+        st.metric("😟 Happiness Alerts (30 days)", count)
+    with col2:
+        count = len(recent[recent['metric'] == 'sales']) if not recent.empty else 0
+        st.metric("📦 Sales Alerts (30 days)", count)
+    
+    if not recent.empty:
+        recent_table = recent[['date', 'metric', 'name', 'value', 'baseline', 'z', 'direction']].copy()
+        recent_table.columns = ['📅 Date', '📊 Metric', '🍽️ Dish / Item', 'Value', f'{TREND_WINDOW_DAYS}-day Avg', 'z-score', 'Change']
+        st.dataframe(recent_table, use_container_width=True, hide_index=True)
+    else:
+        st.success("✅ No unusual days in the last 30 days.")
+    
+    st.divider()
+    col1, col2 = st.columns(2)
+    with col1:
+        metric = st.selectbox("Trend to show:", ["sentiment", "sales"],
+                              format_func=lambda m: "😊 Happiness per dish" if m == "sentiment" else "📦 Sales per item")
+    trend = trends.get(metric)
+    if trend is not None and len(trend["values"].columns):
+        with col2:
+            name = st.selectbox("Dish / item:", list(trend["values"].columns))
+        label = "Daily Happiness" if metric == "sentiment" else "Daily Items Sold"
+        fig = get_cached_figure(data, f"trend:{metric}:{name}", build_trend_chart, trend, name, label)
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("ℹ️ Trends need review or sales data with a 'date' column.")
+
 # ==================== TAB 5: REVIEWS ====================
-with tab5:
+if active_tab == "🔍 Reviews":
     st.subheader("🔍 Read Customer Reviews")
     st.markdown("""<div class="explanation">
     💡 See what customers are saying about your restaurant. Look for patterns to understand what's working
@@ -808,6 +2374,10 @@ with tab5:
             emoji = "😊" if sentiment == "Positive" else "😟" if sentiment == "Negative" else "😐"
             rating = row.get("rating", "")
             date = row.get("date", "")
+            if pd.isna(date):
+                date = ""
+            elif isinstance(date, pd.Timestamp):
+                date = date.strftime("%Y-%m-%d")
             
             review_text = row.get(text_column, "")
             
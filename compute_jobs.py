@@ -0,0 +1,145 @@
+"""
+CPU-heavy jobs for the dashboard: dish extraction (spaCy), sentiment
+scoring (TextBlob) and sales forecasting (ARIMA).
+
+These live outside app.py so worker processes can import them without
+running the Streamlit script; every job is a plain module-level function
+taking and returning picklable values.
+"""
+
+import warnings
+
+import numpy as np
+
+warnings.filterwarnings('ignore')
+
+# Try to import spaCy, but make it optional
+try:
+    import spacy
+    SPACY_INSTALLED = True
+except ImportError:
+    SPACY_INSTALLED = False
+
+# Try to import TextBlob
+try:
+    from textblob import TextBlob
+    TEXTBLOB_INSTALLED = True
+except ImportError:
+    TEXTBLOB_INSTALLED = False
+
+# Try to import statsmodels, but make it optional
+try:
+    from statsmodels.tsa.arima.model import ARIMA
+    HAS_STATSMODELS = True
+except ImportError:
+    HAS_STATSMODELS = False
+    ARIMA = None
+
+# ----------------------------------------------------------
+# Load spaCy model with graceful fallback (once per process)
+# ----------------------------------------------------------
+_nlp = None
+_nlp_loaded = False
+
+def get_nlp():
+    """The spaCy pipeline, loaded on first use; None when unavailable"""
+    global _nlp, _nlp_loaded
+    if not _nlp_loaded:
+        _nlp_loaded = True
+        if SPACY_INSTALLED:
+            try:
+                _nlp = spacy.load("en_core_web_sm")
+            except OSError:
+                # Model not downloaded yet, will use keyword fallback
+                _nlp = None
+    return _nlp
+
+def warm_up():
+    """Worker initializer: pay the model load once, not on the first job"""
+    get_nlp()
+
+# ----------------------------------------------------------
+# Extract dishes (works with or without spaCy)
+# ----------------------------------------------------------
+DISH_KEYWORDS = [
+    "pizza","burger","pasta","salad","soup","steak","fries","tacos","biryani",
+    "sandwich","wrap","momos","noodles","ramen","curry","pancakes","omelette"
+]
+
+def extract_dish(text):
+    """Extract dish name from text using spaCy if available, otherwise keyword matching"""
+    text_lower = text.lower()
+
+    # First try spaCy if available
+    nlp = get_nlp()
+    if nlp is not None:
+        try:
+            doc = nlp(text_lower)
+            for chunk in doc.noun_chunks:
+                for dish in DISH_KEYWORDS:
+                    if dish in chunk.text:
+                        return dish
+        except:
+            pass
+
+    # Fallback to simple keyword matching
+    for dish in DISH_KEYWORDS:
+        if dish in text_lower:
+            return dish
+
+    return "Unknown"
+
+# ----------------------------------------------------------
+# Sentiment
+# ----------------------------------------------------------
+def simple_sentiment(text):
+    """Simple sentiment fallback without TextBlob"""
+    positive_words = ['good', 'great', 'excellent', 'love', 'amazing', 'delicious', 'perfect', 'wonderful', 'fantastic', 'awesome']
+    negative_words = ['bad', 'terrible', 'hate', 'awful', 'horrible', 'poor', 'worst', 'disgusting', 'nasty']
+    text_lower = str(text).lower()
+    pos_count = sum(text_lower.count(word) for word in positive_words)
+    neg_count = sum(text_lower.count(word) for word in negative_words)
+    if pos_count + neg_count == 0:
+        return 0
+    return (pos_count - neg_count) / (pos_count + neg_count)
+
+def score_sentiment(text):
+    """Polarity in [-1, 1], from TextBlob when installed"""
+    if TEXTBLOB_INSTALLED:
+        return TextBlob(str(text)).sentiment.polarity
+    return simple_sentiment(text)
+
+def enrich_texts(texts):
+    """Job: (dishes, sentiments) for a chunk of review texts"""
+    return [extract_dish(text) for text in texts], [score_sentiment(text) for text in texts]
+
+# ----------------------------------------------------------
+# Sales Forecasting with ARIMA
+# ----------------------------------------------------------
+def forecast_sales(sales_data, periods=7):
+    """Forecast sales using ARIMA model (optional feature)"""
+    if not HAS_STATSMODELS:
+        return None
+
+    try:
+        if len(sales_data) < 4:
+            return None
+
+        # Ensure we have a proper array/series
+        if isinstance(sales_data, np.ndarray):
+            sales_array = sales_data
+        else:
+            sales_array = np.array(sales_data)
+
+        model = ARIMA(sales_array, order=(1, 1, 1))
+        fitted_model = model.fit()
+        forecast = fitted_model.get_forecast(steps=periods)
+
+        # Handle the forecast result - it may be Series or array
+        forecast_values = forecast.predicted_mean
+        if hasattr(forecast_values, 'values'):
+            return forecast_values.values
+        else:
+            return np.array(forecast_values)
+    except Exception as e:
+        return None